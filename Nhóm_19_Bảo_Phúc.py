@@ -1,19 +1,241 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+import time
 import json
 import os
-import hashlib
-import requests
+import sys
+import importlib
 from datetime import datetime
 import threading
-import random
+import queue
+import bisect
 import string
 import re
+import collections
+import contextlib
+import functools
+import itertools
+import array
+import operator
+import heapq
+import gc
+
+class StartupReport:
+    """Đo thời gian khởi động: các mốc và các module được nạp trễ (kiểu -X importtime)"""
+    
+    started = time.perf_counter()
+    phases = []     # (mốc, ms tính từ lúc bắt đầu nạp file này)
+    imports = []    # (module, ms nạp, ms tại thời điểm nạp)
+    
+    @staticmethod
+    def elapsed_ms():
+        """Thời gian (ms) từ lúc bắt đầu nạp file này"""
+        return (time.perf_counter() - StartupReport.started) * 1000
+    
+    @staticmethod
+    def mark(phase):
+        """Ghi một mốc khởi động"""
+        StartupReport.phases.append((phase, round(StartupReport.elapsed_ms(), 2)))
+    
+    @staticmethod
+    def as_dict():
+        """Báo cáo dạng dict"""
+        return {
+            "phases": [{"phase": phase, "ms": ms} for phase, ms in StartupReport.phases],
+            "lazy_imports": [{"module": name, "import_ms": cost, "at_ms": at}
+                             for name, cost, at in StartupReport.imports]
+        }
+    
+    @staticmethod
+    def print_if_enabled():
+        """In báo cáo ra stderr khi đặt CRM_STARTUP_REPORT=1"""
+        if os.environ.get("CRM_STARTUP_REPORT"):
+            print(json.dumps(StartupReport.as_dict(), ensure_ascii=False), file=sys.stderr)
+
+class LazyModule:
+    """Module chỉ được import ở lần truy cập thuộc tính đầu tiên"""
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def load(self):
+        """Import module (một lần) và ghi lại thời gian nạp"""
+        if self._module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)
+            StartupReport.imports.append((self._name, round((time.perf_counter() - start) * 1000, 2),
+                                          round(StartupReport.elapsed_ms(), 2)))
+            self._module = module
+        return self._module
+    
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+class Metrics:
+    """Đo độ trễ từng thao tác: số lần gọi, lỗi, lược đồ độ trễ và các lần gọi chậm nhất"""
+    
+    # Bật bằng CRM_METRICS=1, từ bảng hiệu năng hoặc tham số --metrics của CLI
+    enabled = bool(os.environ.get("CRM_METRICS"))
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+    SLOWEST = 5         # số lần gọi chậm nhất giữ lại cho mỗi thao tác
+    RECENT = 1024       # số mẫu gần nhất dùng tính p50/p99
+    lock = threading.Lock()
+    operations = {}     # tên thao tác -> số liệu
+    
+    @staticmethod
+    def timed(name=None):
+        """Decorator đo thời gian hàm; khi tắt chỉ tốn một lần kiểm tra cờ"""
+        def decorator(func):
+            label = name or func.__qualname__
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not Metrics.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                failed = False
+                try:
+                    return func(*args, **kwargs)
+                except BaseException:
+                    failed = True
+                    raise
+                finally:
+                    Metrics.record(label, (time.perf_counter() - start) * 1000, failed)
+            return wrapper
+        return decorator
+    
+    @staticmethod
+    def record(name, elapsed_ms, failed=False):
+        """Ghi một lần gọi"""
+        with Metrics.lock:
+            stats = Metrics.operations.get(name)
+            if stats is None:
+                stats = Metrics.operations[name] = {
+                    "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "buckets": [0] * (len(Metrics.BUCKETS_MS) + 1),
+                    "recent": collections.deque(maxlen=Metrics.RECENT),
+                    "slowest": []   # min-heap (ms, thời điểm, luồng)
+                }
+            stats["count"] += 1
+            stats["errors"] += failed
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["buckets"][bisect.bisect_left(Metrics.BUCKETS_MS, elapsed_ms)] += 1
+            stats["recent"].append(elapsed_ms)
+            slowest = stats["slowest"]
+            if len(slowest) < Metrics.SLOWEST or elapsed_ms > slowest[0][0]:
+                entry = (elapsed_ms, time.time(), threading.current_thread().name)
+                if len(slowest) < Metrics.SLOWEST:
+                    heapq.heappush(slowest, entry)
+                else:
+                    heapq.heapreplace(slowest, entry)
+    
+    @staticmethod
+    def snapshot():
+        """Số liệu hiện tại dạng dict (dùng cho bảng hiệu năng và xuất JSON)"""
+        with Metrics.lock:
+            operations = {name: dict(stats, recent=sorted(stats["recent"]), slowest=list(stats["slowest"]),
+                                     buckets=list(stats["buckets"]))
+                          for name, stats in Metrics.operations.items()}
+        labels = [f"<={limit}ms" for limit in Metrics.BUCKETS_MS] + [f">{Metrics.BUCKETS_MS[-1]}ms"]
+        result = {}
+        for name, stats in sorted(operations.items()):
+            recent = stats["recent"]
+            result[name] = {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "mean_ms": round(stats["total_ms"] / stats["count"], 3),
+                "p50_ms": round(Benchmark.percentile(recent, 0.50), 3),
+                "p99_ms": round(Benchmark.percentile(recent, 0.99), 3),
+                "max_ms": round(stats["max_ms"], 3),
+                "histogram": {label: n for label, n in zip(labels, stats["buckets"]) if n},
+                "slowest": [{"ms": round(ms, 3), "at": datetime.fromtimestamp(at).strftime("%Y-%m-%d %H:%M:%S"),
+                             "thread": thread}
+                            for ms, at, thread in sorted(stats["slowest"], reverse=True)]
+            }
+        return result
+    
+    @staticmethod
+    def reset():
+        """Xóa toàn bộ số liệu"""
+        with Metrics.lock:
+            Metrics.operations.clear()
+    
+    @staticmethod
+    def dump(filename):
+        """Ghi số liệu ra file JSON"""
+        return DataManager.save_json(filename, {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "operations": Metrics.snapshot()
+        })
+
+@contextlib.contextmanager
+def gc_paused():
+    """Tạm tắt GC vòng khi tạo hàng loạt object không có tham chiếu vòng"""
+    # Mỗi lần quét thế hệ 2 trên hàng trăm nghìn bản ghi mất hàng chục ms và giữ GIL,
+    # làm giật giao diện khi đang tải trên luồng nền
+    # Không gc.freeze(): object bị đóng băng không bao giờ được thu hồi nếu sau này nằm trong vòng tham chiếu.
+    # GC là thiết lập của cả tiến trình nên chỉ dùng cho lần tải đầu tiên, không dùng khi tải lại
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+# Các module nặng hoặc ít dùng được nạp khi cần để cửa sổ đăng nhập hiện nhanh hơn
+requests = LazyModule("requests")
+hashlib = LazyModule("hashlib")
+hmac = LazyModule("hmac")
+base64 = LazyModule("base64")
+random = LazyModule("random")
+sqlite3 = LazyModule("sqlite3")
+tracemalloc = LazyModule("tracemalloc")
+tempfile = LazyModule("tempfile")
+csv = LazyModule("csv")
+argparse = LazyModule("argparse")
+http_server = LazyModule("http.server")
+urllib_parse = LazyModule("urllib.parse")
+futures = LazyModule("concurrent.futures")
+multiprocessing = LazyModule("multiprocessing")
+unicodedata = LazyModule("unicodedata")
+socket = LazyModule("socket")
+fcntl = LazyModule("fcntl")     # khóa file trên Linux/macOS
+msvcrt = LazyModule("msvcrt")   # khóa file trên Windows
+
+# tkinter chỉ được nạp khi mở giao diện để CLI chạy được trên máy chủ không có màn hình
+tk = ttk = messagebox = simpledialog = filedialog = None
+
+def _import_tk():
+    """Nạp tkinter vào các biến toàn cục tk, ttk, messagebox, simpledialog, filedialog"""
+    global tk, ttk, messagebox, simpledialog, filedialog
+    if tk is None:
+        start = time.perf_counter()
+        import tkinter
+        from tkinter import ttk as tk_ttk, messagebox as tk_messagebox
+        from tkinter import simpledialog as tk_simpledialog, filedialog as tk_filedialog
+        tk, ttk, messagebox = tkinter, tk_ttk, tk_messagebox
+        simpledialog, filedialog = tk_simpledialog, tk_filedialog
+        StartupReport.imports.append(("tkinter", round((time.perf_counter() - start) * 1000, 2),
+                                      round(StartupReport.elapsed_ms(), 2)))
 
 class DataManager:
     """Class quản lý dữ liệu JSON"""
     
+    # umask của tiến trình: chỉ đọc được bằng cách đặt lại, nên đọc một lần lúc nạp module
+    # (trên luồng chính, trước khi có luồng ghi nào tạo file)
+    UMASK = os.umask(0o022)
+    os.umask(UMASK)
+    
+    @staticmethod
+    def json_default(obj):
+        """Chuyển các bản ghi không phải dict (vd: Customer) khi ghi JSON"""
+        if hasattr(obj, "to_dict"):
+            return obj.to_dict()
+        raise TypeError(f"Không thể ghi kiểu {type(obj).__name__} ra JSON")
+    
     @staticmethod
+    @Metrics.timed()
     def load_json(filename):
         """Đọc dữ liệu từ file JSON"""
         try:
@@ -26,305 +248,3680 @@ class DataManager:
             return []
     
     @staticmethod
+    def temp_path(filename):
+        """Tạo file tạm cùng thư mục với filename để os.replace là thao tác nguyên tử"""
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, path = tempfile.mkstemp(prefix=os.path.basename(filename) + ".", suffix=".tmp", dir=directory)
+        os.close(fd)
+        # mkstemp luôn tạo file 0600 và os.replace giữ nguyên quyền đó cho file đích
+        os.chmod(path, DataManager.file_mode(filename))
+        return path
+    
+    @staticmethod
+    def file_mode(filename):
+        """Quyền cho file thay thế filename: giữ quyền file cũ, file mới thì theo umask như open()"""
+        try:
+            return os.stat(filename).st_mode & 0o7777
+        except FileNotFoundError:
+            return 0o666 & ~DataManager.UMASK
+    
+    @staticmethod
+    def write_temp(filename, write, binary=False):
+        """Ghi vào file tạm cạnh filename rồi fsync; trả về đường dẫn file tạm để os.replace"""
+        temp_file = DataManager.temp_path(filename)
+        try:
+            if binary:
+                file = open(temp_file, 'wb')
+            else:
+                file = open(temp_file, 'w', encoding='utf-8')
+            with file:
+                write(file)
+                file.flush()
+                os.fsync(file.fileno())
+            return temp_file
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+    
+    @staticmethod
+    def atomic_write(filename, write, binary=False):
+        """Ghi file an toàn: ghi vào file tạm, fsync rồi thay thế file đích bằng os.replace"""
+        temp_file = DataManager.write_temp(filename, write, binary)
+        try:
+            os.replace(temp_file, filename)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+    
+    @staticmethod
+    def dump_json(file, data):
+        """Ghi dữ liệu JSON vào file đang mở"""
+        json.dump(data, file, ensure_ascii=False, indent=2, default=DataManager.json_default)
+    
+    @staticmethod
+    @Metrics.timed()
     def save_json(filename, data):
-        """Ghi dữ liệu vào file JSON"""
+        """Ghi dữ liệu vào file JSON (an toàn khi bị tắt giữa chừng)"""
+        try:
+            DataManager.atomic_write(filename, lambda file: DataManager.dump_json(file, data))
+            return True
+        except Exception as e:
+            print(f"Lỗi ghi file {filename}: {e}")
+            return False
+    
+    @staticmethod
+    def iter_ndjson_rows(filename):
+        """Đọc lần lượt các dòng của file NDJSON: (số dòng, bản ghi, lỗi), bản ghi là None nếu dòng lỗi"""
+        with open(filename, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_number, json.loads(line), None
+                except ValueError as e:
+                    yield line_number, None, f"JSON không hợp lệ: {e}"
+    
+    @staticmethod
+    def iter_ndjson(filename):
+        """Đọc lần lượt từng bản ghi của file NDJSON (mỗi dòng một bản ghi), bỏ qua dòng lỗi"""
+        if not os.path.exists(filename):
+            return
+        # Báo lỗi ra stderr: stdout có thể là đầu ra JSON lines của CLI
+        try:
+            for line_number, record, error in DataManager.iter_ndjson_rows(filename):
+                if error:
+                    print(f"Bỏ qua dòng {line_number} lỗi trong {filename}: {error}", file=sys.stderr)
+                else:
+                    yield record
+        except OSError as e:
+            print(f"Lỗi đọc file {filename}: {e}", file=sys.stderr)
+    
+    @staticmethod
+    def write_ndjson(file, records):
+        """Ghi lần lượt các bản ghi vào file đang mở, trả về số bản ghi"""
+        count = 0
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"),
+                                  default=DataManager.json_default))
+            file.write("\n")
+            count += 1
+        return count
+    
+    @staticmethod
+    @Metrics.timed()
+    def save_ndjson(filename, records):
+        """Ghi danh sách bản ghi ra file NDJSON (an toàn khi bị tắt giữa chừng)"""
         try:
-            with open(filename, 'w', encoding='utf-8') as file:
-                json.dump(data, file, ensure_ascii=False, indent=2)
+            DataManager.atomic_write(filename, lambda file: DataManager.write_ndjson(file, records))
             return True
         except Exception as e:
             print(f"Lỗi ghi file {filename}: {e}")
             return False
+    
+    @staticmethod
+    def iter_json_array(filename, chunk_size=1024 * 1024):
+        """Đọc lần lượt từng phần tử của file JSON dạng mảng mà không nạp cả file"""
+        if not os.path.exists(filename):
+            return
+        with open(filename, 'r', encoding='utf-8') as file:
+            yield from DataManager.iter_json_chunks(iter(lambda: file.read(chunk_size), ""))
+    
+    @staticmethod
+    def iter_json_chunks(chunks):
+        """Giải mã lần lượt từng object của một mảng JSON nhận theo từng đoạn văn bản"""
+        decoder = json.JSONDecoder()
+        separators = re.compile(r'[\s,]*')
+        chunks = iter(chunks)
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk
+            if buffer.strip():
+                break
+        buffer = buffer.lstrip()
+        if not buffer:
+            return
+        if buffer[0] != '[':
+            raise ValueError("Dữ liệu không phải mảng JSON")
+        
+        pos = 1
+        eof = False
+        while True:
+            pos = separators.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                if pos >= len(buffer):
+                    raise ValueError("Hết dữ liệu trong bộ đệm")
+                item, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    raise ValueError("Mảng JSON bị cắt cụt hoặc sai định dạng")
+                # Phần tử bị cắt ở cuối đoạn: đọc thêm dữ liệu
+                chunk = next(chunks, None)
+                eof = chunk is None
+                buffer = buffer[pos:] + (chunk or "")
+                pos = 0
+                continue
+            yield item
+    
+    @staticmethod
+    @Metrics.timed()
+    def convert_json_to_ndjson(json_file, ndjson_file):
+        """Chuyển file JSON dạng mảng (định dạng cũ) sang NDJSON, trả về số bản ghi"""
+        counts = []
+        DataManager.atomic_write(ndjson_file, lambda file: counts.append(
+            DataManager.write_ndjson(file, DataManager.iter_json_array(json_file))))
+        return counts[0]
+    
+    @staticmethod
+    def migrate_json_to_sqlite(db_file="crm.db", customers_file="customers.json", users_file="users.json"):
+        """Chuyển dữ liệu từ các file JSON (kèm nhật ký) sang cơ sở dữ liệu SQLite"""
+        customer_json = JsonStorage(customers_file, ChangeJournal(os.path.splitext(customers_file)[0] + ".journal"))
+        customers = customer_json.load()
+        users = JsonStorage(users_file, ChangeJournal(os.path.splitext(users_file)[0] + ".journal")).load()
+        
+        customer_storage = SQLiteCustomerStorage(db_file)
+        user_storage = SQLiteUserStorage(db_file)
+        try:
+            # last_id đi cùng dữ liệu để id đã xóa không bị cấp lại sau khi chuyển
+            if (not customer_storage.save_all(customers) or not user_storage.save_all(users)
+                    or not customer_storage.save_meta(customer_json.load_meta())):
+                return False, "Lỗi ghi dữ liệu vào SQLite"
+        finally:
+            customer_storage.close()
+            user_storage.close()
+        return True, f"Đã chuyển {len(customers)} khách hàng và {len(users)} người dùng"
 
-class UserManager:
-    """Class quản lý người dùng và phân quyền"""
+class FileLock:
+    """Khóa tư vấn giữa các tiến trình (nhiều máy dùng chung file) qua file <tên>.lock đặt cạnh dữ liệu"""
+    
+    TIMEOUT = 10.0          # giây chờ tối đa trước khi báo lỗi
+    POLL_INTERVAL = 0.05
+    
+    def __init__(self, filename, timeout=None):
+        self.path = filename + ".lock"
+        self.timeout = self.TIMEOUT if timeout is None else timeout
+        # Khóa trong tiến trình: các luồng chờ nhau, cùng luồng được khóa lồng nhau
+        self.local = threading.RLock()
+        self.depth = 0
+        self.file = None
+    
+    def acquire(self):
+        """Giữ khóa, chờ tối đa timeout giây nếu phiên bản khác đang giữ"""
+        self.local.acquire()
+        if self.depth == 0:
+            try:
+                self.lock_file()
+            except BaseException:
+                self.local.release()
+                raise
+        self.depth += 1
+    
+    def release(self):
+        """Nhả khóa"""
+        self.depth -= 1
+        if self.depth == 0:
+            self.unlock_file()
+        self.local.release()
+    
+    def lock_file(self):
+        """Khóa file .lock ở mức hệ điều hành"""
+        self.file = open(self.path, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    self.file.seek(0)
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self.file.close()
+                    self.file = None
+                    raise TimeoutError(f"Dữ liệu đang được máy khác ghi ({self.path}), vui lòng thử lại sau") from None
+                time.sleep(self.POLL_INTERVAL)
+    
+    def unlock_file(self):
+        """Mở khóa file .lock"""
+        try:
+            if os.name == "nt":
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.file.close()
+            self.file = None
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+
+class FileState:
+    """Dấu vết của file (mtime, kích thước, mã băm nội dung) để biết phiên bản khác đã ghi hay chưa"""
+    
+    def __init__(self, filename):
+        self.filename = filename
+        self.stat = self.read_stat(filename)
+        self.digest = self.read_digest(filename) if self.stat else None
+    
+    @staticmethod
+    def read_stat(filename):
+        """(mtime_ns, kích thước) hoặc None nếu file chưa có"""
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    @staticmethod
+    def read_digest(filename, chunk_size=1024 * 1024):
+        """Mã băm SHA-1 của nội dung file"""
+        digest = hashlib.sha1()
+        try:
+            with open(filename, 'rb') as file:
+                for chunk in iter(lambda: file.read(chunk_size), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        return digest.hexdigest()
+    
+    def changed(self):
+        """So mtime/kích thước trước (chỉ một lần stat), chỉ băm lại khi kích thước giữ nguyên mà mtime đổi"""
+        stat = self.read_stat(self.filename)
+        if stat == self.stat:
+            return False
+        if stat is None or self.stat is None or stat[1] != self.stat[1]:
+            return True
+        if self.read_digest(self.filename) == self.digest:
+            # Chỉ bị touch hoặc ghi lại y hệt (vd: đồng hồ ổ mạng lệch): không cần tải lại
+            self.stat = stat
+            return False
+        return True
+
+class ChangeJournal:
+    """Nhật ký thay đổi dạng append-only cho dữ liệu khách hàng/người dùng"""
+    
+    def __init__(self, filename, compact_threshold=1024 * 1024):
+        self.filename = filename
+        self.compact_threshold = compact_threshold
+        # JsonStorage thay bằng FileLock để các phiên bản ứng dụng dùng chung nhật ký an toàn
+        self.lock = threading.RLock()
+        self.compacting = False
+        # Số byte đầu nhật ký đã được áp dụng vào dữ liệu trong bộ nhớ
+        self.applied = 0
+    
+    def size(self):
+        """Kích thước hiện tại của file nhật ký (byte)"""
+        try:
+            return os.path.getsize(self.filename)
+        except OSError:
+            return 0
+    
+    def append(self, op, record=None, record_id=None):
+        """Ghi thêm một thay đổi ('put' hoặc 'del') vào cuối nhật ký"""
+        if op == "put":
+            entry = {"op": "put", "data": record}
+        else:
+            entry = {"op": "del", "id": record_id}
+        return self.append_entries([entry])
+    
+    def append_many(self, records):
+        """Ghi thêm nhiều bản ghi ('put') trong một lần ghi"""
+        return self.append_entries([{"op": "put", "data": record} for record in records])
+    
+    def append_entries(self, entries):
+        """Ghi các mục nhật ký vào cuối file"""
+        data = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":"),
+                                  default=DataManager.json_default) + "\n"
+                       for entry in entries).encode("utf-8")
+        try:
+            with self.lock:
+                with open(self.filename, 'a+b') as file:
+                    start = file.seek(0, os.SEEK_END)
+                    if start:
+                        file.seek(start - 1)
+                        if file.read(1) != b"\n":
+                            # Dòng ghi dở do bị tắt đột ngột: không để dòng mới dính vào
+                            data = b"\n" + data
+                    file.write(data)
+                # Chỉ tiến khi không còn thay đổi nào của phiên bản khác chưa đọc nằm phía trước
+                if start == self.applied:
+                    self.applied = start + len(data)
+            return True
+        except Exception as e:
+            print(f"Lỗi ghi nhật ký {self.filename}: {e}")
+            return False
+    
+    def read_changes(self, start=0):
+        """Đọc nhật ký từ byte start thành bảng id -> bản ghi mới nhất (None nếu đã bị xóa), kèm vị trí đã đọc tới"""
+        changes = {}
+        end = start
+        if not os.path.exists(self.filename):
+            return changes, end
+        try:
+            with open(self.filename, 'rb') as file:
+                file.seek(start)
+                for line in file:
+                    end += len(line)
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Dòng ghi dở do chương trình bị tắt đột ngột
+                        continue
+                    
+                    if entry.get("op") == "put":
+                        changes[entry["data"]["id"]] = entry["data"]
+                    elif entry.get("op") == "del":
+                        changes[entry["id"]] = None
+        except Exception as e:
+            print(f"Lỗi đọc nhật ký {self.filename}: {e}")
+        return changes, end
+    
+    def replay(self, records):
+        """Áp dụng nhật ký lên dãy bản ghi của snapshot, trả về generator"""
+        changes, self.applied = self.read_changes()
+        for record in records:
+            if record["id"] in changes:
+                record = changes.pop(record["id"])
+                if record is None:
+                    continue
+            yield record
+        # Bản ghi mới chỉ có trong nhật ký
+        for record in changes.values():
+            if record is not None:
+                yield record
+    
+    def needs_compaction(self):
+        """Kiểm tra nhật ký đã vượt ngưỡng cần nén hay chưa"""
+        return not self.compacting and self.size() >= self.compact_threshold
+    
+    def position(self):
+        """Vị trí cuối phần nhật ký mà dữ liệu trong bộ nhớ đã gồm"""
+        return self.applied
+    
+    def read_tail(self, position):
+        """Phần nhật ký sau position (các thay đổi chưa nằm trong snapshot)"""
+        if not os.path.exists(self.filename):
+            return b""
+        with open(self.filename, 'rb') as file:
+            file.seek(position)
+            return file.read()
+    
+    def discard_until(self, position):
+        """Bỏ phần đầu nhật ký tới position (đã nằm trong snapshot mới)"""
+        tail = self.read_tail(position)
+        DataManager.atomic_write(self.filename, lambda file: file.write(tail), binary=True)
+        self.applied = max(0, self.applied - position)
+
+class BackgroundSaver:
+    """Luồng ghi nền: gộp các lần lưu cùng một file thành một lần ghi"""
     
     def __init__(self):
-        self.users_file = "users.json"
-        self.users = self.load_users()
-        self.current_user = None
-        
-        # Tạo admin mặc định nếu chưa có
-        if not self.users:
-            self.create_default_admin()
+        self.pending = {}       # khóa (tên file) -> hàm ghi mới nhất
+        self.active = 0
+        self.condition = threading.Condition()
+        self.thread = None
     
-    def load_users(self):
-        """Tải danh sách người dùng"""
-        return DataManager.load_json(self.users_file)
+    def submit(self, key, write):
+        """Đưa một lần ghi vào hàng đợi, thay thế lần ghi chưa chạy của cùng file"""
+        with self.condition:
+            self.pending.pop(key, None)
+            self.pending[key] = write
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
     
-    def save_users(self):
-        """Lưu danh sách người dùng"""
-        return DataManager.save_json(self.users_file, self.users)
+    def run(self):
+        """Vòng lặp của luồng ghi"""
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                key = next(iter(self.pending))
+                write = self.pending.pop(key)
+                self.active += 1
+            try:
+                write()
+            except Exception as e:
+                print(f"Lỗi ghi nền {key}: {e}")
+            finally:
+                with self.condition:
+                    self.active -= 1
+                    self.condition.notify_all()
     
-    def hash_password(self, password):
-        """Mã hóa mật khẩu"""
-        return hashlib.sha256(password.encode()).hexdigest()
+    def flush(self, timeout=None):
+        """Chờ mọi lần ghi đang chờ hoàn tất (gọi khi thoát ứng dụng)"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and not self.active, timeout)
+
+class JsonStorage:
+    """Lưu trữ dữ liệu trong file JSON, có thể kèm nhật ký thay đổi"""
     
-    def generate_random_password(self, length=8):
-        """Tạo mật khẩu ngẫu nhiên"""
-        characters = string.ascii_letters + string.digits
-        return ''.join(random.choice(characters) for _ in range(length))
+    def __init__(self, filename, journal=None, saver=None):
+        self.filename = filename
+        self.journal = journal
+        self.saver = saver      # BackgroundSaver, nếu có thì ghi cả file ở luồng nền
+        self.meta_file = os.path.splitext(filename)[0] + ".meta.json"
+        # Nhiều máy có thể dùng chung file trên ổ mạng: mọi lần đọc-sửa-ghi đều giữ khóa file
+        self.file_lock = FileLock(filename)
+        if journal:
+            journal.lock = self.file_lock
+        self.snapshot_state = None  # dấu vết snapshot lúc tải, để nhận ra phiên bản khác đã ghi
     
-    def create_default_admin(self):
-        """Tạo tài khoản admin mặc định"""
-        admin_user = {
-            "id": 1,
-            "username": "admin",
-            "password": self.hash_password("admin123"),
-            "role": "admin",
-            "email": "admin@example.com",
-            "security_question": "Tên thú cưng đầu tiên của bạn?",
-            "security_answer": self.hash_password("admin"),
-            "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        self.users.append(admin_user)
-        self.save_users()
+    def load(self):
+        """Đọc toàn bộ bản ghi"""
+        return list(self.iter_records())
     
-    def login(self, username, password):
-        """Đăng nhập"""
-        hashed_password = self.hash_password(password)
-        for user in self.users:
-            if user["username"] == username and user["password"] == hashed_password:
-                self.current_user = user
-                return True
-        return False
+    def read_snapshot(self):
+        """Đọc lần lượt các bản ghi trong snapshot"""
+        # Giải mã từng phần tử thay vì json.load cả file: không giữ GIL hàng trăm ms
+        # khi tải trên luồng nền và không cần giữ cùng lúc cả danh sách dict lẫn Customer
+        try:
+            yield from DataManager.iter_json_array(self.filename)
+        except (OSError, ValueError) as e:
+            print(f"Lỗi đọc file {self.filename}: {e}", file=sys.stderr)
     
-    def register(self, username, password, email, security_question, security_answer, role="user"):
-        """Đăng ký tài khoản mới"""
-        for user in self.users:
-            if user["username"] == username:
-                return False, "Tên đăng nhập đã tồn tại"
-        
-        for user in self.users:
-            if user.get("email") == email:
-                return False, "Email đã được sử dụng"
-        
-        new_user = {
-            "id": len(self.users) + 1,
-            "username": username,
-            "password": self.hash_password(password),
-            "role": role,
-            "email": email,
-            "security_question": security_question,
-            "security_answer": self.hash_password(security_answer.lower()),
-            "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        self.users.append(new_user)
-        if self.save_users():
-            return True, "Đăng ký thành công"
-        return False, "Lỗi lưu dữ liệu"
+    def iter_records(self):
+        """Duyệt lần lượt các bản ghi (snapshot + nhật ký)"""
+        # Giữ khóa để snapshot và nhật ký đọc được khớp với nhau
+        with self.file_lock:
+            self.snapshot_state = FileState(self.filename)
+            records = self.read_snapshot()
+            if self.journal:
+                records = self.journal.replay(records)
+            yield from records
     
-    def change_password(self, current_password, new_password):
-        """Đổi mật khẩu cho user hiện tại"""
-        if not self.current_user:
-            return False, "Chưa đăng nhập"
-        
-        # Kiểm tra mật khẩu hiện tại
-        current_hashed = self.hash_password(current_password)
-        if self.current_user["password"] != current_hashed:
-            return False, "Mật khẩu hiện tại không đúng"
+    def locked(self):
+        """Khóa giữa các phiên bản ứng dụng, giữ trong suốt một lần đọc-sửa-ghi"""
+        return self.file_lock
+    
+    def has_external_changes(self):
+        """Phiên bản khác đã ghi từ lần đọc trước chưa (chỉ stat file, không đọc dữ liệu)"""
+        if self.snapshot_state is None:
+            return False
+        if self.journal and self.journal.size() != self.journal.applied:
+            return True
+        return self.snapshot_state.changed()
+    
+    def read_external_changes(self):
+        """Đọc phần nhật ký do phiên bản khác ghi thêm: bảng id -> bản ghi (None nếu đã xóa),
+        hoặc None nếu snapshot đã bị thay và phải tải lại toàn bộ"""
+        with self.file_lock:
+            if self.snapshot_state is None or self.snapshot_state.changed():
+                return None
+            if not self.journal:
+                return {}
+            size = self.journal.size()
+            if size < self.journal.applied:
+                return None
+            if size == self.journal.applied:
+                return {}
+            changes, self.journal.applied = self.journal.read_changes(self.journal.applied)
+            return changes
+    
+    def write_file(self, filename, records):
+        """Ghi toàn bộ bản ghi ra file theo định dạng của storage"""
+        return DataManager.save_json(filename, records)
+    
+    def dump_records(self, file, records):
+        """Ghi toàn bộ bản ghi vào file đang mở theo định dạng của storage"""
+        DataManager.dump_json(file, records)
+    
+    def save_all(self, records):
+        """Ghi lại toàn bộ bản ghi (qua luồng ghi nền nếu có)"""
+        write = self.prepare_write(records)
+        if self.saver:
+            self.saver.submit(self.filename, write)
+            return True
+        return write()
+    
+    def prepare_write(self, records):
+        """Chụp lại dữ liệu hiện tại và trả về hàm ghi có thể chạy ở luồng khác"""
+        # Sao chép dict để luồng ghi không đọc phải dữ liệu đang bị sửa
+        records = [dict(r) if isinstance(r, dict) else r for r in records]
+        if self.journal:
+            position, state = self.journal.position(), self.snapshot_state
+            return lambda: self.write_snapshot(records, position, state)
+        return lambda: self.write_records(records)
+    
+    def write_records(self, records):
+        """Ghi lại cả file (không có nhật ký) khi đang giữ khóa file"""
+        with self.file_lock:
+            saved = self.write_file(self.filename, records)
+            self.snapshot_state = FileState(self.filename)
+        return saved
+    
+    def write_snapshot(self, records, position, state):
+        """Ghi snapshot chứa mọi thay đổi tới position rồi cắt phần nhật ký đã nằm trong snapshot"""
+        temp_file = None
+        try:
+            # Ghi thẳng vào một file tạm: chỉ thay file đích khi snapshot vẫn còn hiệu lực
+            temp_file = DataManager.write_temp(self.filename, lambda file: self.dump_records(file, records))
+            with self.file_lock:
+                if state is not self.snapshot_state or state.changed():
+                    # Snapshot đã được thay (lần nén mới hơn, đã tải lại hoặc phiên bản khác vừa nén):
+                    # mọi thay đổi vẫn còn trong nhật ký nên bỏ qua lần ghi này
+                    return True
+                os.replace(temp_file, self.filename)
+                # Nếu bị tắt trước bước này, các thay đổi cũ được áp dụng lại (put/del là idempotent)
+                self.journal.discard_until(position)
+                self.snapshot_state = FileState(self.filename)
+            return True
+        except Exception as e:
+            print(f"Lỗi ghi snapshot {self.filename}: {e}")
+            return False
+        finally:
+            self.journal.compacting = False
+            if temp_file and os.path.exists(temp_file):
+                os.remove(temp_file)
+    
+    def apply(self, op, record=None, record_id=None, records=None):
+        """Lưu một thay đổi; records là danh sách hiện tại, dùng khi phải ghi lại cả file"""
+        if not self.journal:
+            return self.save_all(records)
         
-        # Kiểm tra độ dài mật khẩu mới
-        if len(new_password) < 6:
-            return False, "Mật khẩu mới phải có ít nhất 6 ký tự"
+        if not self.journal.append(op, record, record_id):
+            return False
+        if self.journal.needs_compaction():
+            self.compact(records)
+        return True
+    
+    def apply_many(self, changed, records=None):
+        """Lưu một lô bản ghi thêm/sửa trong một lần ghi"""
+        if not self.journal:
+            return self.save_all(records)
         
-        # Cập nhật mật khẩu mới
-        new_hashed = self.hash_password(new_password)
-        for user in self.users:
-            if user["id"] == self.current_user["id"]:
-                user["password"] = new_hashed
-                user["password_changed_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.current_user = user  # Cập nhật current_user
+        if not self.journal.append_many(changed):
+            return False
+        if self.journal.needs_compaction():
+            self.compact(records)
+        return True
+    
+    def compact(self, records):
+        """Nén nhật ký vào snapshot: trên luồng ghi nền nếu có, không thì ghi ngay"""
+        if not self.journal:
+            return self.save_all(records)
+        self.journal.compacting = True
+        write = self.prepare_write(records)
+        if self.saver:
+            # Luồng ghi nền được flush khi thoát nên lần nén không bị cắt giữa chừng
+            self.saver.submit(self.filename, write)
+            return True
+        return write()
+    
+    def load_meta(self):
+        """Đọc thông tin phụ (vd: id đã cấp gần nhất)"""
+        meta = DataManager.load_json(self.meta_file)
+        return meta if isinstance(meta, dict) else {}
+    
+    def save_meta(self, meta):
+        """Ghi thông tin phụ"""
+        return DataManager.save_json(self.meta_file, meta)
+    
+    def close(self):
+        """Không cần giải phóng tài nguyên với file JSON"""
+        pass
+
+class NdjsonStorage(JsonStorage):
+    """Lưu trữ dạng NDJSON (mỗi dòng một bản ghi), đọc theo luồng với bộ nhớ giới hạn"""
+    
+    def __init__(self, filename, journal=None, saver=None):
+        super().__init__(filename, journal, saver)
+    
+    def read_snapshot(self):
+        """Đọc lần lượt các bản ghi trong snapshot"""
+        return DataManager.iter_ndjson(self.filename)
+    
+    def write_file(self, filename, records):
+        """Ghi toàn bộ bản ghi ra file NDJSON"""
+        return DataManager.save_ndjson(filename, records)
+    
+    def dump_records(self, file, records):
+        """Ghi toàn bộ bản ghi vào file đang mở, mỗi dòng một bản ghi"""
+        DataManager.write_ndjson(file, records)
+
+class SQLiteStorage:
+    """Lớp cơ sở lưu trữ dữ liệu bằng SQLite"""
+    
+    table = None
+    
+    def __init__(self, db_file="crm.db"):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        # SQLite tự khóa khi ghi; khóa file chỉ giữ chuỗi đọc-sửa-ghi của ứng dụng (vd: cấp id)
+        self.file_lock = FileLock(f"{db_file}.{self.table}")
+        self.data_version = None
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.create_schema()
+    
+    def create_schema(self):
+        """Tạo bảng và chỉ mục"""
+        raise NotImplementedError
+    
+    def to_row(self, record):
+        """Chuyển bản ghi thành tuple giá trị cột"""
+        raise NotImplementedError
+    
+    def from_row(self, row):
+        """Chuyển dòng SQLite thành bản ghi"""
+        raise NotImplementedError
+    
+    def insert_sql(self):
+        """Câu lệnh INSERT OR REPLACE tương ứng với to_row"""
+        placeholders = ", ".join("?" * len(self.row_columns))
+        return f"INSERT OR REPLACE INTO {self.table} ({', '.join(self.row_columns)}) VALUES ({placeholders})"
+    
+    def load(self):
+        """Đọc toàn bộ bản ghi"""
+        return list(self.iter_records())
+    
+    def iter_records(self):
+        """Duyệt lần lượt các bản ghi theo id"""
+        self.mark_loaded()
+        return self.iter_all()
+    
+    def mark_loaded(self):
+        """Ghi nhận dữ liệu đang dùng là bản mới nhất (các thay đổi sau đó mới tính là của phiên bản khác)"""
+        self.data_version = self.read_data_version()
+    
+    def read_data_version(self):
+        """Số phiên bản dữ liệu của bảng, tăng trong mỗi giao dịch ghi vào bảng"""
+        # Không dùng PRAGMA data_version: số đó đổi cả khi kết nối khác của chính tiến trình này
+        # (vd: bảng người dùng) ghi vào CSDL
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (f"{self.table}.version",)).fetchone()
+        return int(row[0]) if row else 0
+    
+    def bump_version(self):
+        """Tăng số phiên bản của bảng (gọi trong giao dịch ghi); lần ghi của chính mình không tính là thay đổi ngoài"""
+        key = f"{self.table}.version"
+        self.conn.execute("INSERT INTO meta (key, value) VALUES (?, 1) "
+                          "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+        version = int(self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0])
+        if self.data_version is not None and version == self.data_version + 1:
+            # Không có lần ghi nào của phiên bản khác xen giữa
+            self.data_version = version
+    
+    def locked(self):
+        """Khóa giữa các phiên bản ứng dụng, giữ trong suốt một lần đọc-sửa-ghi"""
+        return self.file_lock
+    
+    def has_external_changes(self):
+        """Phiên bản khác đã ghi từ lần đọc trước chưa"""
+        return self.data_version is not None and self.read_data_version() != self.data_version
+    
+    def read_external_changes(self):
+        """Không có nhật ký để đọc riêng phần thay đổi: None (tải lại toàn bộ) nếu đã có thay đổi"""
+        return None if self.has_external_changes() else {}
+    
+    def iter_all(self, order_by="id"):
+        """Duyệt lần lượt các bản ghi mà không nạp hết vào bộ nhớ"""
+        cursor = self.conn.execute(f"SELECT * FROM {self.table} ORDER BY {order_by}")
+        for row in cursor:
+            yield self.from_row(row)
+    
+    def save_all(self, records):
+        """Ghi lại toàn bộ bản ghi trong một giao dịch"""
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(f"DELETE FROM {self.table}")
+                self.conn.executemany(self.insert_sql(), (self.to_row(r) for r in records))
+                self.bump_version()
+            return True
+        except Exception as e:
+            print(f"Lỗi ghi SQLite {self.db_file}: {e}")
+            return False
+    
+    def apply(self, op, record=None, record_id=None, records=None):
+        """Lưu một thay đổi ('put' hoặc 'del')"""
+        try:
+            with self.lock, self.conn:
+                if op == "put":
+                    self.conn.execute(self.insert_sql(), self.to_row(record))
+                else:
+                    self.conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (record_id,))
+                self.bump_version()
+            return True
+        except Exception as e:
+            print(f"Lỗi ghi SQLite {self.db_file}: {e}")
+            return False
+    
+    def apply_many(self, changed, records=None):
+        """Lưu một lô bản ghi thêm/sửa trong một giao dịch"""
+        try:
+            with self.lock, self.conn:
+                self.conn.executemany(self.insert_sql(), (self.to_row(r) for r in changed))
+                self.bump_version()
+            return True
+        except Exception as e:
+            print(f"Lỗi ghi SQLite {self.db_file}: {e}")
+            return False
+    
+    def get(self, record_id):
+        """Lấy bản ghi theo id"""
+        row = self.conn.execute(f"SELECT * FROM {self.table} WHERE id = ?", (record_id,)).fetchone()
+        return self.from_row(row) if row else None
+    
+    def count(self):
+        """Số bản ghi"""
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+    
+    def max_id(self):
+        """Id lớn nhất hiện có"""
+        return self.conn.execute(f"SELECT MAX(id) FROM {self.table}").fetchone()[0] or 0
+    
+    def load_meta(self):
+        """Đọc thông tin phụ của bảng"""
+        cursor = self.conn.execute("SELECT key, value FROM meta WHERE key LIKE ?", (f"{self.table}.%",))
+        return {key.split(".", 1)[1]: json.loads(value) for key, value in cursor}
+    
+    def save_meta(self, meta):
+        """Ghi thông tin phụ của bảng"""
+        try:
+            with self.lock, self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                      [(f"{self.table}.{k}", json.dumps(v)) for k, v in meta.items()])
+            return True
+        except Exception as e:
+            print(f"Lỗi ghi SQLite {self.db_file}: {e}")
+            return False
+    
+    def compact(self, records=None):
+        """Gộp WAL vào file chính và thu hồi dung lượng trống"""
+        try:
+            with self.lock:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.execute("VACUUM")
+            return True
+        except Exception as e:
+            print(f"Lỗi nén SQLite {self.db_file}: {e}")
+            return False
+    
+    def close(self):
+        """Đóng kết nối"""
+        self.conn.close()
+
+class SQLiteCustomerStorage(SQLiteStorage):
+    """Lưu trữ khách hàng bằng SQLite, đẩy tìm kiếm và sắp xếp xuống SQL"""
+    
+    table = "customers"
+    row_columns = ("id", "name", "email", "phone", "address", "customer_type",
+                   "created_date", "updated_date", "name_key", "search_key")
+    # Tăng khi cách tính search_key đổi (lưu trong PRAGMA user_version)
+    SEARCH_KEY_VERSION = 1
+    
+    # Biểu thức sắp xếp tương ứng với CustomerManager.sort_customers
+    SORT_EXPRESSIONS = {
+        "id": "id",
+        "name": "name_key",
+        "email": "lower(email)",
+        "phone": "phone",
+        "customer_type": "lower(customer_type)",
+        "created_date": "created_date",
+    }
+    
+    def create_schema(self):
+        """Tạo bảng khách hàng và các chỉ mục"""
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS customers (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT,
+                phone TEXT,
+                address TEXT,
+                customer_type TEXT,
+                created_date TEXT,
+                updated_date TEXT,
+                name_key TEXT,
+                search_key TEXT)""")
+            # name_key = lower(name) tính bằng Python vì lower() của SQLite chỉ xử lý ASCII
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_name_key ON customers(name_key)")
+            # Chỉ mục theo đúng biểu thức trong SORT_EXPRESSIONS để sắp xếp/phân trang không phải sắp lại cả bảng
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_email_key ON customers(lower(email))")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_type_key ON customers(lower(customer_type))")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_created_date ON customers(created_date)")
+        
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < self.SEARCH_KEY_VERSION:
+            # CSDL tạo trước khi search_key được bỏ dấu: tính lại một lần
+            rows = self.conn.execute("SELECT id, name, email, phone, address, customer_type FROM customers").fetchall()
+            with self.conn:
+                self.conn.executemany("UPDATE customers SET search_key = ? WHERE id = ?",
+                                      [(self.search_key(dict(row)), row["id"]) for row in rows])
+                self.conn.execute(f"PRAGMA user_version = {self.SEARCH_KEY_VERSION}")
+    
+    @staticmethod
+    def search_key(record):
+        """Nội dung tìm kiếm đã chuẩn hóa (chữ thường, bỏ dấu) lưu sẵn trong cột search_key"""
+        return SearchIndex.normalize("\n".join((record["name"], record["email"], record["phone"],
+                                                record["address"], record.get("customer_type") or "")))
+    
+    def to_row(self, record):
+        """Chuyển khách hàng thành tuple giá trị cột"""
+        search_key = self.search_key(record)
+        return (record["id"], record["name"], record["email"], record["phone"], record["address"],
+                record.get("customer_type", ""), record.get("created_date", ""),
+                record.get("updated_date"), record["name"].lower().strip(), search_key)
+    
+    def from_row(self, row):
+        """Chuyển dòng SQLite thành dict khách hàng"""
+        customer = {
+            "id": row["id"],
+            "name": row["name"],
+            "email": row["email"],
+            "phone": row["phone"],
+            "address": row["address"],
+            "customer_type": row["customer_type"],
+            "created_date": row["created_date"]
+        }
+        if row["updated_date"]:
+            customer["updated_date"] = row["updated_date"]
+        return customer
+    
+    def name_ids(self, name):
+        """Id các khách hàng có tên trùng (không phân biệt hoa thường), tra bằng chỉ mục name_key"""
+        cursor = self.conn.execute("SELECT id FROM customers WHERE name_key = ?", (name.lower().strip(),))
+        return [row[0] for row in cursor]
+    
+    def order_by(self, column, reverse=False):
+        """Mệnh đề ORDER BY của cột; id đi kèm để thứ tự ổn định giống CustomerManager.sort_customers"""
+        direction = " DESC" if reverse else ""
+        return f"{self.SORT_EXPRESSIONS.get(column, 'id')}{direction}, id{direction}"
+    
+    @staticmethod
+    def like_pattern(text):
+        """Mẫu LIKE tìm chuỗi con (đã thoát ký tự đặc biệt, dùng với ESCAPE '\\')"""
+        return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    
+    def search_sql(self, keyword, column=None, reverse=False):
+        """Câu lệnh tìm kiếm: (sql, tham số, truy vấn cần kiểm tra lại bằng Python hoặc None)"""
+        if CustomerQuery.is_query(keyword):
+            query = CustomerQuery.parse(keyword)
+            terms = query.terms
+        else:
+            query = None
+            terms = [(None, SearchIndex.normalize(keyword))]
+        # Mỗi điều kiện thành một bộ lọc SQL; giá trị của một trường luôn là chuỗi con của search_key
+        # nên bộ lọc không bỏ sót, truy vấn theo trường được kiểm tra lại đúng trường bằng Python
+        conditions = []
+        params = []
+        for field, value in terms:
+            if field == "created_date":
+                start, end = value
+                conditions.append("created_date >= ?")
+                params.append(start)
+                if end:
+                    conditions.append("created_date <= ?")
+                    params.append(end + "\uffff")
+            else:
+                conditions.append("search_key LIKE ? ESCAPE '\\'")
+                params.append(self.like_pattern(value))
+        where = " AND ".join(conditions) or "1"
+        return f"SELECT * FROM customers WHERE {where} ORDER BY {self.order_by(column, reverse)}", params, query
+    
+    def search(self, keyword, column=None, reverse=False, limit=None):
+        """Tìm kiếm (và sắp xếp) trực tiếp trong SQLite, trả về generator; nhận cả truy vấn theo trường"""
+        sql, params, query = self.search_sql(keyword, column, reverse)
+        if limit is not None and query is None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        records = (self.from_row(row) for row in self.conn.execute(sql, params))
+        if query is not None:
+            records = itertools.islice((r for r in records if query.matches(r)), limit)
+        yield from records
+    
+    def explain(self, keyword):
+        """Kế hoạch thực hiện của SQLite cho câu lệnh tìm kiếm"""
+        sql, params, _ = self.search_sql(keyword)
+        return [row["detail"] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    
+    def iter_sorted(self, column, reverse=False):
+        """Duyệt khách hàng theo thứ tự cột bằng chỉ mục"""
+        return self.iter_all(order_by=self.order_by(column, reverse))
+    
+    def page(self, column, reverse, offset, limit):
+        """Một đoạn khách hàng liên tiếp theo thứ tự cột (dùng cho bảng hiển thị từng phần)"""
+        cursor = self.conn.execute(f"SELECT * FROM customers ORDER BY {self.order_by(column, reverse)} "
+                                   "LIMIT ? OFFSET ?", (limit, offset))
+        return [self.from_row(row) for row in cursor]
+
+class SQLiteUserStorage(SQLiteStorage):
+    """Lưu trữ người dùng bằng SQLite"""
+    
+    table = "users"
+    row_columns = ("id", "username", "email", "data")
+    
+    def create_schema(self):
+        """Tạo bảng người dùng và các chỉ mục"""
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                username TEXT UNIQUE NOT NULL,
+                email TEXT,
+                data TEXT NOT NULL)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
+    
+    def to_row(self, record):
+        """Chuyển người dùng thành tuple giá trị cột"""
+        return (record["id"], record["username"], record.get("email"),
+                json.dumps(record, ensure_ascii=False))
+    
+    def from_row(self, row):
+        """Chuyển dòng SQLite thành dict người dùng"""
+        return json.loads(row["data"])
+
+class PasswordHasher:
+    """Băm mật khẩu bằng KDF có muối; chuỗi kết quả tự mô tả thuật toán và tham số"""
+    
+    # Định dạng: thuật_toán$tham_số$muối$giá_trị_băm (base64)
+    ALGORITHM = None    # None: scrypt nếu có, nếu không thì PBKDF2 (xác định khi băm lần đầu)
+    COSTS = {"scrypt": 2 ** 14, "pbkdf2_sha256": 600000}   # N của scrypt / số vòng PBKDF2
+    SCRYPT_R = 8
+    SCRYPT_P = 1
+    SALT_SIZE = 16
+    # Nếu đặt CRM_KDF_TARGET_MS, chi phí được hiệu chỉnh theo máy ở lần băm đầu tiên
+    TARGET_MS = float(os.environ.get("CRM_KDF_TARGET_MS", "0") or 0)
+    _calibrated = False
+    
+    @staticmethod
+    def algorithm():
+        """Thuật toán đang dùng"""
+        if PasswordHasher.ALGORITHM is None:
+            PasswordHasher.ALGORITHM = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256"
+        return PasswordHasher.ALGORITHM
+    
+    @staticmethod
+    def derive(password, salt, algorithm, cost):
+        """Tính giá trị băm thô"""
+        if algorithm == "scrypt":
+            r, p = PasswordHasher.SCRYPT_R, PasswordHasher.SCRYPT_P
+            return hashlib.scrypt(password.encode(), salt=salt, n=cost, r=r, p=p,
+                                  maxmem=256 * r * cost + 1024 * 1024)
+        if algorithm == "pbkdf2_sha256":
+            return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, cost)
+        raise ValueError(f"Thuật toán băm không hỗ trợ: {algorithm}")
+    
+    @staticmethod
+    def hash(password, algorithm=None, cost=None):
+        """Băm mật khẩu với muối ngẫu nhiên"""
+        if PasswordHasher.TARGET_MS and not PasswordHasher._calibrated:
+            PasswordHasher.configure(cost=PasswordHasher.calibrate(PasswordHasher.TARGET_MS))
+        algorithm = algorithm or PasswordHasher.algorithm()
+        cost = cost or PasswordHasher.COSTS[algorithm]
+        salt = os.urandom(PasswordHasher.SALT_SIZE)
+        digest = PasswordHasher.derive(password, salt, algorithm, cost)
+        return "$".join((algorithm, str(cost), base64.b64encode(salt).decode(),
+                         base64.b64encode(digest).decode()))
+    
+    @staticmethod
+    def is_legacy(encoded):
+        """Chuỗi băm SHA-256 không muối của phiên bản cũ"""
+        return "$" not in encoded
+    
+    @staticmethod
+    def verify(password, encoded):
+        """Kiểm tra mật khẩu với chuỗi băm (hỗ trợ cả SHA-256 cũ)"""
+        if not encoded:
+            return False
+        if PasswordHasher.is_legacy(encoded):
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+        try:
+            algorithm, cost, salt, digest = encoded.split("$")
+            expected = PasswordHasher.derive(password, base64.b64decode(salt), algorithm, int(cost))
+        except ValueError as e:
+            print(f"Chuỗi băm không hợp lệ: {e}")
+            return False
+        return hmac.compare_digest(expected, base64.b64decode(digest))
+    
+    @staticmethod
+    def needs_rehash(encoded):
+        """Chuỗi băm cũ hoặc dùng thuật toán/chi phí khác cấu hình hiện tại"""
+        if PasswordHasher.is_legacy(encoded):
+            return True
+        algorithm, cost = encoded.split("$")[:2]
+        return algorithm != PasswordHasher.algorithm() or int(cost) != PasswordHasher.COSTS[algorithm]
+    
+    @staticmethod
+    def configure(algorithm=None, cost=None):
+        """Đổi thuật toán/chi phí dùng cho các lần băm sau"""
+        PasswordHasher.ALGORITHM = algorithm or PasswordHasher.algorithm()
+        if cost:
+            PasswordHasher.COSTS[PasswordHasher.ALGORITHM] = cost
+        PasswordHasher._calibrated = True
+    
+    @staticmethod
+    def time_hash(algorithm, cost):
+        """Thời gian (ms) của một lần băm"""
+        start = time.perf_counter()
+        PasswordHasher.derive("calibration", b"0" * PasswordHasher.SALT_SIZE, algorithm, cost)
+        return (time.perf_counter() - start) * 1000
+    
+    @staticmethod
+    def calibrate(target_ms=250, algorithm=None):
+        """Chọn chi phí lớn nhất mà một lần băm không vượt quá target_ms trên máy này"""
+        algorithm = algorithm or PasswordHasher.algorithm()
+        if algorithm == "pbkdf2_sha256":
+            # Thời gian PBKDF2 tỉ lệ thuận với số vòng
+            sample = 20000
+            return max(sample, int(sample * target_ms / PasswordHasher.time_hash(algorithm, sample)))
+        
+        # scrypt: N phải là lũy thừa của 2, tăng gấp đôi cho tới khi vượt ngưỡng
+        cost = 2 ** 12
+        while cost < 2 ** 20 and PasswordHasher.time_hash(algorithm, cost * 2) <= target_ms:
+            cost *= 2
+        return cost
+
+class UserManager:
+    """Class quản lý người dùng và phân quyền"""
+    
+    def __init__(self, storage=None, saver=None):
+        self.users_file = "users.json"
+        if storage is None:
+            # Ghi thêm vào nhật ký để đăng ký/đổi mật khẩu không phải ghi lại cả file
+            storage = JsonStorage(self.users_file, ChangeJournal("users.journal"), saver)
+        self.storage = storage
+        self.users = self.load_users()
+        self.current_user = None
+        self._by_username = {}  # username -> user
+        self._by_email = {}     # email -> user
+        self.last_id = 0        # id đã cấp gần nhất, không bao giờ giảm
+        # Đăng nhập/đổi mật khẩu chạy trên luồng nền
+        self.lock = threading.RLock()
+        self.rebuild_indexes()
+        
+        # Tạo admin mặc định nếu chưa có
+        if not self.users:
+            self.create_default_admin()
+    
+    @Metrics.timed()
+    def load_users(self):
+        """Tải danh sách người dùng"""
+        return self.storage.load()
+    
+    @Metrics.timed()
+    def save_users(self):
+        """Lưu danh sách người dùng"""
+        self.storage.save_meta({"last_id": self.last_id})
+        return self.storage.save_all(self.users)
+    
+    def rebuild_indexes(self):
+        """Xây dựng lại chỉ mục username/email và dãy id"""
+        self._by_username = {user["username"]: user for user in self.users}
+        self._by_email = {user["email"]: user for user in self.users if user.get("email")}
+        stored_last_id = self.storage.load_meta().get("last_id", 0)
+        self.last_id = max(self.last_id, stored_last_id, max((u["id"] for u in self.users), default=0))
+    
+    def sync_external_changes(self):
+        """Tải lại người dùng nếu phiên bản khác đã ghi (gọi khi đang giữ khóa; danh sách nhỏ nên đọc lại cả)"""
+        if self.storage.read_external_changes() == {}:
+            return False
+        self.users = self.load_users()
+        self.rebuild_indexes()
+        if self.current_user:
+            self.current_user = self._by_username.get(self.current_user["username"], self.current_user)
+        return True
+    
+    def refresh_if_changed(self):
+        """Đồng bộ với phiên bản khác nếu file người dùng đã đổi (chỉ stat file khi không đổi)"""
+        if not self.storage.has_external_changes():
+            return False
+        with self.lock, self.storage.locked():
+            return self.sync_external_changes()
+    
+    def next_id(self):
+        """Cấp id mới cho người dùng"""
+        self.last_id += 1
+        return self.last_id
+    
+    def _index_user(self, user):
+        """Thêm người dùng vào các chỉ mục"""
+        self._by_username[user["username"]] = user
+        if user.get("email"):
+            self._by_email[user["email"]] = user
+    
+    def persist_user(self, user):
+        """Lưu một người dùng đã thêm/sửa (SQLite chỉ ghi một dòng)"""
+        return self.storage.apply("put", user, records=self.users)
+    
+    def hash_password(self, password):
+        """Mã hóa mật khẩu (KDF chậm, nên gọi ngoài luồng giao diện)"""
+        return PasswordHasher.hash(password)
+    
+    def generate_random_password(self, length=8):
+        """Tạo mật khẩu ngẫu nhiên"""
+        characters = string.ascii_letters + string.digits
+        return ''.join(random.choice(characters) for _ in range(length))
+    
+    def create_default_admin(self):
+        """Tạo tài khoản admin mặc định"""
+        admin_user = {
+            "id": self.next_id(),
+            "username": "admin",
+            "password": self.hash_password("admin123"),
+            "role": "admin",
+            "email": "admin@example.com",
+            "security_question": "Tên thú cưng đầu tiên của bạn?",
+            "security_answer": self.hash_password("admin"),
+            "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.users.append(admin_user)
+        self._index_user(admin_user)
+        self.save_users()
+    
+    @Metrics.timed()
+    def login(self, username, password):
+        """Đăng nhập"""
+        # Tài khoản có thể vừa được tạo/đổi mật khẩu trên máy khác
+        self.refresh_if_changed()
+        user = self._by_username.get(username)
+        if not user or not PasswordHasher.verify(password, user["password"]):
+            return False
+        
+        # Nâng cấp chuỗi băm cũ (SHA-256 hoặc chi phí khác cấu hình) khi đã biết mật khẩu gốc
+        rehashed = self.hash_password(password) if PasswordHasher.needs_rehash(user["password"]) else None
+        with self.lock:
+            if rehashed:
+                with self.storage.locked():
+                    self.sync_external_changes()
+                    current = self._by_username.get(username, user)
+                    # Bỏ qua nếu mật khẩu vừa được đổi ở máy khác trong lúc băm
+                    if current["password"] == user["password"]:
+                        current["password"] = rehashed
+                        self.persist_user(current)
+                    user = current
+            self.current_user = user
+        return True
+    
+    @Metrics.timed()
+    def register(self, username, password, email, security_question, security_answer, role="user"):
+        """Đăng ký tài khoản mới"""
+        self.refresh_if_changed()
+        if username in self._by_username:
+            return False, "Tên đăng nhập đã tồn tại"
+        
+        if email in self._by_email:
+            return False, "Email đã được sử dụng"
+        
+        password_hash = self.hash_password(password)
+        answer_hash = self.hash_password(security_answer.lower())
+        
+        with self.lock, self.storage.locked():
+            # Kiểm tra lại vì có thể đã có đăng ký khác (kể cả trên máy khác) trong lúc băm
+            self.sync_external_changes()
+            if username in self._by_username or email in self._by_email:
+                return False, "Tên đăng nhập hoặc email đã được sử dụng"
+            new_user = {
+                "id": self.next_id(),
+                "username": username,
+                "password": password_hash,
+                "role": role,
+                "email": email,
+                "security_question": security_question,
+                "security_answer": answer_hash,
+                "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            
+            self.users.append(new_user)
+            self._index_user(new_user)
+            if self.persist_user(new_user):
+                return True, "Đăng ký thành công"
+        return False, "Lỗi lưu dữ liệu"
+    
+    @Metrics.timed()
+    def change_password(self, current_password, new_password):
+        """Đổi mật khẩu cho user hiện tại"""
+        if not self.current_user:
+            return False, "Chưa đăng nhập"
+        
+        # Kiểm tra mật khẩu hiện tại
+        if not PasswordHasher.verify(current_password, self.current_user["password"]):
+            return False, "Mật khẩu hiện tại không đúng"
+        
+        # Kiểm tra độ dài mật khẩu mới
+        if len(new_password) < 6:
+            return False, "Mật khẩu mới phải có ít nhất 6 ký tự"
+        
+        # Cập nhật mật khẩu mới
+        new_hashed = self.hash_password(new_password)
+        with self.lock, self.storage.locked():
+            self.sync_external_changes()
+            user = self._by_username.get(self.current_user["username"], self.current_user)
+            user["password"] = new_hashed
+            user["password_changed_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.current_user = user  # Cập nhật current_user
+            
+            if self.persist_user(user):
+                return True, "Đổi mật khẩu thành công"
+        return False, "Lỗi lưu dữ liệu"
+    
+    @Metrics.timed()
+    def reset_password(self, username, security_answer):
+        """Đặt lại mật khẩu"""
+        self.refresh_if_changed()
+        user = self._by_username.get(username)
+        answer = security_answer.lower()
+        if user and PasswordHasher.verify(answer, user.get("security_answer")):
+            new_password = self.generate_random_password()
+            new_hashed = self.hash_password(new_password)
+            answer_hash = self.hash_password(answer) if PasswordHasher.needs_rehash(user["security_answer"]) else None
+            with self.lock, self.storage.locked():
+                self.sync_external_changes()
+                user = self._by_username.get(username, user)
+                user["password"] = new_hashed
+                if answer_hash:
+                    user["security_answer"] = answer_hash
+                user["password_reset_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                if self.persist_user(user):
+                    return True, new_password
+            return False, "Lỗi lưu dữ liệu"
+        return False, "Thông tin không chính xác"
+    
+    def get_user_by_username(self, username):
+        """Lấy thông tin user theo username"""
+        return self._by_username.get(username)
+    
+    def is_admin(self):
+        """Kiểm tra quyền admin"""
+        return self.current_user and self.current_user["role"] == "admin"
+    
+    def can_edit_customers(self):
+        """Kiểm tra quyền sửa khách hàng - chỉ admin mới được sửa"""
+        return self.is_admin()
+    
+    def can_add_customers(self):
+        """Kiểm tra quyền thêm khách hàng - cả admin và user đều được thêm"""
+        return self.current_user is not None
+    
+    def logout(self):
+        """Đăng xuất"""
+        self.current_user = None
+
+class APIService:
+    """Class tích hợp API để lấy dữ liệu mẫu"""
+    
+    BASE_URL = "https://jsonplaceholder.typicode.com/users"
+    TIMEOUT = (3.05, 10)        # (kết nối, đọc) giây cho mỗi request
+    DEADLINE = 30.0             # giây tối đa cho cả một lần lấy dữ liệu, kể cả các lần thử lại
+    MAX_RETRIES = 3
+    BACKOFF = 0.5               # giây, nhân đôi sau mỗi lần thử lại
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    
+    _session = None
+    _session_lock = threading.Lock()
+    
+    @staticmethod
+    def get_session(pool_size=16):
+        """Session dùng chung để tái sử dụng kết nối (connection pool)"""
+        with APIService._session_lock:
+            if APIService._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                APIService._session = session
+            return APIService._session
+    
+    @staticmethod
+    def abort_after(response, seconds):
+        """Hẹn giờ cắt kết nối của response: lần đọc đang chờ máy chủ gửi nhỏ giọt cũng bị ngắt"""
+        # Timeout đọc chỉ tính từng lần nhận dữ liệu, không giới hạn cả thân response
+        def abort():
+            sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        
+        timer = threading.Timer(max(0.0, seconds), abort)
+        timer.daemon = True
+        timer.start()
+        return timer
+    
+    @staticmethod
+    def fetch_json_array(url, params=None, deadline=None):
+        """Tải một mảng JSON, giải mã theo luồng; thử lại với thời gian chờ tăng dần khi lỗi cho tới hạn chót"""
+        # deadline: thời điểm time.monotonic() phải xong, mặc định DEADLINE giây kể từ bây giờ
+        if deadline is None:
+            deadline = time.monotonic() + APIService.DEADLINE
+        session = APIService.get_session()
+        for attempt in range(APIService.MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise requests.Timeout(f"Quá thời hạn khi tải {url}")
+            timeout = tuple(min(limit, remaining) for limit in APIService.TIMEOUT)
+            try:
+                with session.get(url, params=params, timeout=timeout, stream=True) as response:
+                    if response.status_code in APIService.RETRY_STATUSES:
+                        raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                    response.raise_for_status()
+                    response.encoding = response.encoding or "utf-8"
+                    watchdog = APIService.abort_after(response, deadline - time.monotonic())
+                    try:
+                        return list(DataManager.iter_json_chunks(
+                            response.iter_content(chunk_size=64 * 1024, decode_unicode=True)))
+                    except Exception as e:
+                        if time.monotonic() >= deadline:
+                            raise requests.Timeout(f"Quá thời hạn khi tải {url}") from e
+                        raise
+                    finally:
+                        watchdog.cancel()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                status = e.response.status_code if getattr(e, "response", None) is not None else None
+                if attempt == APIService.MAX_RETRIES or (status and status not in APIService.RETRY_STATUSES):
+                    raise
+                delay = APIService.BACKOFF * (2 ** attempt)
+                if time.monotonic() + delay >= deadline:
+                    # Không còn đủ thời gian cho lần thử tiếp theo
+                    raise
+                time.sleep(delay)
+    
+    @staticmethod
+    def fetch_pages(url, page_size=100, concurrency=4, max_pages=1000, deadline=None):
+        """Tải song song các trang (?_page=&_limit=) cho tới khi gặp trang thiếu"""
+        users = []
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            page = 1
+            while page <= max_pages:
+                pages = range(page, min(page + concurrency, max_pages + 1))
+                results = executor.map(
+                    lambda p: APIService.fetch_json_array(url, {"_page": p, "_limit": page_size}, deadline), pages)
+                last_page_full = True
+                for items in results:
+                    users.extend(items)
+                    last_page_full = len(items) >= page_size
+                    if not last_page_full:
+                        break
+                if not last_page_full:
+                    break
+                page += concurrency
+        return users
+    
+    @staticmethod
+    def fetch_many(urls, concurrency=4, deadline=None):
+        """Tải song song nhiều endpoint, bỏ qua endpoint bị lỗi"""
+        def fetch(url):
+            try:
+                return APIService.fetch_json_array(url, deadline=deadline)
+            except Exception as e:
+                print(f"Lỗi khi lấy dữ liệu từ {url}: {e}")
+                return []
+        
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return [user for users in executor.map(fetch, urls) for user in users]
+    
+    @staticmethod
+    def to_customer(user, customer_types):
+        """Chuyển một user của API thành khách hàng"""
+        return {
+            "id": user["id"],
+            "name": user["name"],
+            "email": user["email"],
+            # Chuẩn hóa nếu được, giữ nguyên số gốc nếu không nhận dạng được
+            "phone": CustomerValidator.normalize_phone(user["phone"]) or user["phone"],
+            "address": f"{user['address']['street']}, {user['address']['city']}",
+            "customer_type": random.choice(customer_types),
+            "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+    
+    @staticmethod
+    @Metrics.timed()
+    def fetch_sample_customers(urls=None, page_size=None, concurrency=4, timeout=None):
+        """Lấy dữ liệu khách hàng mẫu từ API (một hoặc nhiều endpoint, có thể phân trang) trong tối đa timeout giây"""
+        urls = urls or [APIService.BASE_URL]
+        # Một hạn chót chung cho mọi endpoint, trang và lần thử lại
+        deadline = time.monotonic() + (timeout or APIService.DEADLINE)
+        try:
+            if page_size:
+                users_data = []
+                for url in urls:
+                    users_data.extend(APIService.fetch_pages(url, page_size, concurrency, deadline=deadline))
+            else:
+                users_data = APIService.fetch_many(urls, concurrency, deadline)
+            
+            customer_types = ["Khách hàng thường", "Khách hàng VIP"]
+            return [APIService.to_customer(user, customer_types) for user in users_data]
+        except Exception as e:
+            print(f"Lỗi khi lấy dữ liệu từ API: {e}")
+            return []
+
+class StubCustomerServer:
+    """Máy chủ HTTP cục bộ trả về dữ liệu user giả lập (dạng jsonplaceholder) để test/đo offline"""
+    
+    def __init__(self, total=10000, host="127.0.0.1", port=0, delay=0.0):
+        self.total = total
+        self.delay = delay      # giây, giả lập endpoint chậm
+        stub = self
+        
+        class Handler(http_server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def handle(self):
+                try:
+                    super().handle()
+                except (ConnectionResetError, BrokenPipeError):
+                    pass        # client đóng kết nối keep-alive
+            
+            def do_GET(self):
+                stub.handle(self)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = http_server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+    
+    @property
+    def url(self):
+        """Địa chỉ endpoint /users"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/users"
+    
+    @staticmethod
+    def make_user(user_id):
+        """Tạo một user giả lập"""
+        return {
+            "id": user_id,
+            "name": f"Người dùng {user_id}",
+            "username": f"user{user_id}",
+            "email": f"user{user_id}@example.com",
+            "phone": f"09{user_id % 100000000:08d}",
+            "address": {"street": f"{user_id} Lê Lợi", "city": "Hà Nội"}
+        }
+    
+    def handle(self, request):
+        """Trả về toàn bộ hoặc một trang user, ghi theo từng đoạn (chunked)"""
+        query = urllib_parse.parse_qs(urllib_parse.urlparse(request.path).query)
+        if self.delay:
+            time.sleep(self.delay)
+        if "_page" in query:
+            limit = int(query.get("_limit", ["10"])[0])
+            start = (int(query["_page"][0]) - 1) * limit + 1
+            stop = min(start + limit, self.total + 1)
+        else:
+            start, stop = 1, self.total + 1
+        
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json; charset=utf-8")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+        
+        def write_chunk(text):
+            data = text.encode("utf-8")
+            request.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        
+        batch = ["["]
+        for user_id in range(start, stop):
+            if user_id > start:
+                batch.append(",")
+            batch.append(json.dumps(self.make_user(user_id), ensure_ascii=False))
+            if len(batch) >= 2000:
+                write_chunk("".join(batch))
+                batch = []
+        batch.append("]")
+        write_chunk("".join(batch))
+        request.wfile.write(b"0\r\n\r\n")
+    
+    def start(self):
+        """Chạy máy chủ trên luồng nền"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        """Dừng máy chủ"""
+        self.server.shutdown()
+        self.server.server_close()
+
+class CustomerValidator:
+    """Các quy tắc kiểm tra dữ liệu khách hàng (dùng chung cho form, import và API)"""
+    
+    # Biên dịch sẵn một lần thay vì mỗi lần gọi re.match
+    EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    PHONE_PATTERN = re.compile(r'^(?:\+84|0)(?:\d{9}|\d{8})$|^(?:\+?\d{1,3})?\d{8,12}$')
+    PHONE_SEPARATORS = re.compile(r'[\s.\-()]')
+    
+    REQUIRED_FIELDS = ("name", "email", "phone")
+    
+    @staticmethod
+    def validate_email(email):
+        """Kiểm tra định dạng email"""
+        return CustomerValidator.EMAIL_PATTERN.match(email) is not None
+    
+    @staticmethod
+    def validate_phone(phone):
+        """Kiểm tra định dạng số điện thoại"""
+        return CustomerValidator.PHONE_PATTERN.match(phone) is not None
+    
+    @staticmethod
+    def normalize_phone(phone):
+        """Chuẩn hóa số điện thoại về dạng +<mã quốc gia><số>, trả về None nếu không hợp lệ"""
+        if not phone:
+            return None
+        digits = CustomerValidator.PHONE_SEPARATORS.sub("", phone)
+        if digits.startswith("00"):
+            digits = "+" + digits[2:]
+        if not CustomerValidator.PHONE_PATTERN.match(digits):
+            return None
+        if digits.startswith("0"):
+            # Số trong nước: 0912345678 -> +84912345678
+            return "+84" + digits[1:]
+        return digits if digits.startswith("+") else "+" + digits
+    
+    @staticmethod
+    def validate_many(records):
+        """Kiểm tra nhiều khách hàng, trả về vector lỗi theo từng trường (None nếu hợp lệ)"""
+        email_match = CustomerValidator.EMAIL_PATTERN.match
+        phone_match = CustomerValidator.PHONE_PATTERN.match
+        errors = {"name": [], "email": [], "phone": []}
+        name_errors = errors["name"].append
+        email_errors = errors["email"].append
+        phone_errors = errors["phone"].append
+        
+        for record in records:
+            name = record.get("name")
+            email = record.get("email")
+            phone = record.get("phone")
+            name_errors(None if name else "Thiếu tên khách hàng")
+            if not email:
+                email_errors("Thiếu email")
+            else:
+                email_errors(None if email_match(email) else "Email không hợp lệ")
+            if not phone:
+                phone_errors("Thiếu số điện thoại")
+            else:
+                phone_errors(None if phone_match(phone) else "Số điện thoại không hợp lệ")
+        return errors
+    
+    @staticmethod
+    def row_errors(errors, index):
+        """Gộp lỗi các trường của bản ghi thứ index thành một thông báo (None nếu hợp lệ)"""
+        messages = [errors[field][index] for field in CustomerValidator.REQUIRED_FIELDS
+                    if errors[field][index]]
+        return "; ".join(messages) if messages else None
+    
+    @staticmethod
+    def validate_record(record):
+        """Kiểm tra một khách hàng, trả về thông báo lỗi hoặc None nếu hợp lệ"""
+        return CustomerValidator.row_errors(CustomerValidator.validate_many([record]), 0)
+
+def validate_customer_chunk(chunk):
+    """Kiểm tra một lô (số dòng, bản ghi, lỗi đọc); hàm cấp module để chạy được trong process pool"""
+    # Dòng không đọc được giữ nguyên lỗi đọc, không đưa vào kiểm tra
+    errors = CustomerValidator.validate_many([record for _, record, error in chunk if not error])
+    results = []
+    index = 0
+    for row_number, record, error in chunk:
+        if not error:
+            error = CustomerValidator.row_errors(errors, index)
+            index += 1
+        results.append((row_number, record, error))
+    return results
+
+class Customer:
+    """Bản ghi khách hàng gọn nhẹ dùng __slots__, truy cập giống dict"""
+    
+    FIELDS = ("id", "name", "email", "phone", "address", "customer_type",
+              "created_date", "updated_date")
+    # extra: các trường ngoài danh sách trên (hiếm gặp), None nếu không có;
+    # search_key: nội dung tìm kiếm đã chuẩn hóa (SearchIndex.search_text), None nếu chưa tính
+    __slots__ = FIELDS + ("extra", "search_key")
+    
+    def __init__(self, **fields):
+        self.extra = None
+        for key, value in fields.items():
+            self[key] = value
+        self.search_key = None
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Tạo Customer từ dict (trả về nguyên bản nếu đã là Customer)"""
+        if isinstance(data, cls):
+            return data
+        return cls(**data)
+    
+    def to_dict(self):
+        """Chuyển thành dict để ghi JSON"""
+        return dict(self.items())
+    
+    def __getitem__(self, key):
+        if key in Customer.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key in Customer.FIELDS:
+            if key == "customer_type" and isinstance(value, str):
+                # Chỉ có vài loại khách hàng: dùng chung một chuỗi
+                value = sys.intern(value)
+            setattr(self, key, value)
+            self.search_key = None
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    
+    def __contains__(self, key):
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+    
+    def get(self, key, default=None):
+        """Lấy giá trị trường, trả về default nếu không có"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def keys(self):
+        """Danh sách các trường đang có giá trị"""
+        keys = [key for key in Customer.FIELDS if hasattr(self, key)]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+    
+    def items(self):
+        """Các cặp (trường, giá trị)"""
+        return [(key, self[key]) for key in self.keys()]
+    
+    def values(self):
+        """Các giá trị"""
+        return [self[key] for key in self.keys()]
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self):
+        return len(self.keys())
+    
+    def copy(self):
+        """Bản sao nông"""
+        return Customer(**self.to_dict())
+    
+    def __repr__(self):
+        return f"Customer({self.to_dict()!r})"
+
+class SyntheticData:
+    """Sinh dữ liệu khách hàng giả lập kiểu Việt Nam, tái lập được theo seed"""
+    
+    # (họ, trọng số) theo tỉ lệ phổ biến gần đúng
+    SURNAMES = [("Nguyễn", 38), ("Trần", 11), ("Lê", 9), ("Phạm", 7), ("Hoàng", 5), ("Huỳnh", 4),
+                ("Phan", 4), ("Vũ", 4), ("Võ", 4), ("Đặng", 2), ("Bùi", 2), ("Đỗ", 2), ("Hồ", 2),
+                ("Ngô", 2), ("Dương", 1), ("Lý", 1)]
+    MIDDLE_NAMES = ["Văn", "Thị", "Hữu", "Đức", "Minh", "Ngọc", "Thanh", "Quốc", "Gia", "Hoàng",
+                    "Xuân", "Thu", "Kim", "Anh", "Bảo", "Thành", "Mỹ", "Khánh", "Trọng", "Công", "Thế",
+                    "Phương", "Tuấn", "Diệu", "Hải", "Như"]
+    GIVEN_NAMES = ["An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Hạnh", "Hiếu", "Hoa", "Hùng",
+                   "Hương", "Khánh", "Lan", "Linh", "Long", "Mai", "Minh", "Nam", "Nga", "Ngọc", "Nhung",
+                   "Phong", "Phúc", "Phương", "Quân", "Quang", "Sơn", "Tâm", "Thảo", "Thắng", "Trang",
+                   "Trung", "Tuấn", "Vy", "Yến", "Đạt", "Đông", "Ánh", "Ý", "Bảo", "Chi", "Cường", "Duy",
+                   "Dương", "Hạ", "Hậu", "Hòa", "Huy", "Khang", "Khoa", "Kiên", "Lâm", "Loan", "Lộc", "Luân",
+                   "My", "Nghĩa", "Nhi", "Oanh", "Phát", "Quyên", "Tài", "Thịnh", "Thủy", "Tiến", "Toàn",
+                   "Trâm", "Uyên", "Vinh", "Việt", "Xuân"]
+    STREETS = ["Lê Lợi", "Nguyễn Huệ", "Trần Hưng Đạo", "Hai Bà Trưng", "Lý Thường Kiệt", "Điện Biên Phủ",
+               "Cách Mạng Tháng Tám", "Nguyễn Trãi", "Phan Đình Phùng", "Hoàng Diệu", "Võ Văn Tần",
+               "Lê Duẩn", "Nguyễn Văn Cừ", "Trường Chinh", "Quang Trung"]
+    DISTRICTS = {
+        "TP.HCM": ["Quận 1", "Quận 3", "Quận 7", "Bình Thạnh", "Gò Vấp", "Tân Bình", "Thủ Đức"],
+        "Hà Nội": ["Ba Đình", "Hoàn Kiếm", "Đống Đa", "Cầu Giấy", "Hai Bà Trưng", "Thanh Xuân"],
+        "Đà Nẵng": ["Hải Châu", "Sơn Trà", "Thanh Khê", "Ngũ Hành Sơn"],
+        "Cần Thơ": ["Ninh Kiều", "Cái Răng", "Bình Thủy"],
+        "Hải Phòng": ["Lê Chân", "Ngô Quyền", "Hồng Bàng"],
+    }
+    PHONE_PREFIXES = ["90", "91", "93", "94", "96", "97", "98", "32", "33", "35", "38", "70", "77",
+                      "79", "81", "83", "85", "86", "88", "89"]
+    EMAIL_DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "fpt.vn", "vnpt.vn", "example.com"]
+    CUSTOMER_TYPES = [("Khách hàng thường", 80), ("Khách hàng VIP", 20)]
+    
+    @staticmethod
+    def ascii_slug(text):
+        """Bỏ dấu tiếng Việt và khoảng trắng để dùng trong email"""
+        return "".join(c for c in SearchIndex.normalize(text) if c.isascii() and c.isalnum())
+    
+    @staticmethod
+    def iter_customers(n, seed=19, start_id=1):
+        """Sinh lần lượt n khách hàng (dict) mà không giữ cả tập trong bộ nhớ"""
+        rng = random.Random(seed)
+        surnames, surname_weights = zip(*SyntheticData.SURNAMES)
+        types, type_weights = zip(*SyntheticData.CUSTOMER_TYPES)
+        cities = list(SyntheticData.DISTRICTS)
+        # Ngày tạo rải đều trong 3 năm tính từ 2023-01-01
+        base = datetime(2023, 1, 1).timestamp()
+        span = 3 * 365 * 24 * 3600
+        # Số lần mỗi họ tên đã xuất hiện: tên trùng được thêm số thứ tự để file sinh ra import được trọn vẹn
+        # (tên thật không kết thúc bằng số nên không trùng lại; bộ đếm giới hạn theo số họ tên có thể tạo)
+        name_counts = {}
+        
+        for customer_id in range(start_id, start_id + n):
+            surname = rng.choices(surnames, surname_weights)[0]
+            given = rng.choice(SyntheticData.GIVEN_NAMES)
+            if rng.random() < 0.5:
+                # Tên đệm kép, vd: Nguyễn Thị Ngọc Anh
+                middle = " ".join(rng.sample(SyntheticData.MIDDLE_NAMES, 2))
+            else:
+                middle = rng.choice(SyntheticData.MIDDLE_NAMES)
+            name = f"{surname} {middle} {given}"
+            count = name_counts.get(name, 0) + 1
+            name_counts[name] = count
+            if count > 1:
+                name = f"{name} {count}"
+            
+            digits = rng.choice(SyntheticData.PHONE_PREFIXES) + f"{rng.randrange(10 ** 7):07d}"
+            phone = f"+84{digits}" if rng.random() < 0.25 else f"0{digits}"
+            
+            city = rng.choice(cities)
+            address = (f"{rng.randint(1, 999)} {rng.choice(SyntheticData.STREETS)}, "
+                       f"{rng.choice(SyntheticData.DISTRICTS[city])}, {city}")
+            email = (f"{SyntheticData.ascii_slug(given)}.{SyntheticData.ascii_slug(surname)}{customer_id}"
+                     f"@{rng.choice(SyntheticData.EMAIL_DOMAINS)}")
+            
+            yield {
+                "id": customer_id,
+                "name": name,
+                "email": email,
+                "phone": phone,
+                "address": address,
+                "customer_type": rng.choices(types, type_weights)[0],
+                "created_date": datetime.fromtimestamp(base + rng.randrange(span)).strftime("%Y-%m-%d %H:%M:%S")
+            }
+    
+    @staticmethod
+    def customers(n, seed=19):
+        """Danh sách n khách hàng giả lập"""
+        return list(SyntheticData.iter_customers(n, seed))
+    
+    @staticmethod
+    def write(filename, n, seed=19, file_format=None):
+        """Ghi n khách hàng ra file JSON hoặc NDJSON theo luồng (dùng được cho hàng triệu bản ghi)"""
+        if file_format is None:
+            file_format = "ndjson" if filename.lower().endswith((".ndjson", ".jsonl")) else "json"
+        records = SyntheticData.iter_customers(n, seed)
+        
+        def write_json_array(file):
+            file.write("[")
+            for index, record in enumerate(records):
+                file.write(",\n" if index else "\n")
+                file.write(json.dumps(record, ensure_ascii=False))
+            file.write("\n]")
+        
+        if file_format == "ndjson":
+            DataManager.atomic_write(filename, lambda file: DataManager.write_ndjson(file, records))
+        else:
+            DataManager.atomic_write(filename, write_json_array)
+        return n
+
+class Benchmark:
+    """Các phép đo hiệu năng"""
+    
+    @staticmethod
+    def sample_customer_dicts(n):
+        """Tạo n khách hàng mẫu dạng dict"""
+        customer_types = ["Khách hàng thường", "Khách hàng VIP"]
+        return [{
+            "id": i,
+            "name": f"Khách hàng {i}",
+            "email": f"khachhang{i}@example.com",
+            "phone": f"09{i:08d}",
+            "address": f"{i} Lê Lợi, Quận 1, TP.HCM",
+            "customer_type": "".join(customer_types[i % 2]),  # chuỗi riêng như khi đọc từ JSON
+            "created_date": "2025-01-01 08:00:00"
+        } for i in range(1, n + 1)]
+    
+    @staticmethod
+    def measure_memory(build):
+        """Đo bộ nhớ (byte) mà kết quả của build() chiếm giữ"""
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            result = build()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del result
+        return after - before
+    
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        """Phân vị của danh sách đã sắp xếp"""
+        if not sorted_values:
+            return 0.0
+        return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+    
+    @staticmethod
+    def time_calls(operation, size, calls, run):
+        """Gọi run(i) cho i trong range(calls), trả về thông lượng và độ trễ p50/p99"""
+        latencies = []
+        started = time.perf_counter()
+        for i in range(calls):
+            start = time.perf_counter()
+            run(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+        total = time.perf_counter() - started
+        latencies.sort()
+        return {
+            "operation": operation,
+            "size": size,
+            "calls": calls,
+            "throughput_per_s": round(calls / total, 1) if total else None,
+            "p50_ms": round(Benchmark.percentile(latencies, 0.50), 4),
+            "p99_ms": round(Benchmark.percentile(latencies, 0.99), 4),
+            "max_ms": round(latencies[-1], 4)
+        }
+    
+    @staticmethod
+    def peak_memory(run):
+        """Bộ nhớ cấp phát đỉnh (MB) trong khi chạy run(), đo riêng vì tracemalloc làm chậm"""
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return round(peak / (1024 * 1024), 2)
+    
+    @staticmethod
+    def suite_for_size(size, seed=19, queries=200):
+        """Đo các thao tác chính của CustomerManager trên tập dữ liệu size khách hàng"""
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            customers_file = os.path.join(directory, "customers.json")
+            SyntheticData.write(customers_file, size, seed)
+            
+            def open_manager():
+                journal = ChangeJournal(os.path.join(directory, "customers.journal"))
+                return CustomerManager(JsonStorage(customers_file, journal))
+            
+            load = Benchmark.time_calls("load_customers", size, 3, lambda i: open_manager())
+            load["peak_memory_mb"] = Benchmark.peak_memory(open_manager)
+            results.append(load)
+            
+            manager = open_manager()
+            rng = random.Random(seed)
+            sample = [manager.customers[rng.randrange(size)] for _ in range(queries)]
+            # Từ khóa đa dạng: một phần tên, tên đầy đủ, email, số điện thoại, từ khóa ngắn, loại khách hàng
+            keywords = []
+            for i, customer in enumerate(sample):
+                choice = i % 6
+                if choice == 0:
+                    keywords.append(customer["name"].split()[-1])
+                elif choice == 1:
+                    keywords.append(customer["name"])
+                elif choice == 2:
+                    keywords.append(customer["email"].split("@")[0])
+                elif choice == 3:
+                    keywords.append(customer["phone"][-6:])
+                elif choice == 4:
+                    keywords.append(customer["name"][:2])
+                else:
+                    keywords.append("VIP")
+            
+            # Dựng chỉ mục (bình thường chạy ở luồng nền sau khi tải), đo riêng
+            results.append(Benchmark.time_calls("build_search_index", size, 1,
+                                                lambda i: manager.build_search_index()))
+            search = Benchmark.time_calls("search_customers", size, len(keywords),
+                                          lambda i: manager.search_customers(keywords[i]))
+            search["peak_memory_mb"] = Benchmark.peak_memory(lambda: manager.search_customers(keywords[1]))
+            results.append(search)
+            
+            columns = list(CustomerManager.SORT_KEYS)
+            results.append(Benchmark.time_calls("sort_customers (cold)", size, len(columns),
+                                                lambda i: manager.sort_customers(columns[i])))
+            sort = Benchmark.time_calls("sort_customers", size, len(columns) * 4,
+                                        lambda i: manager.sort_customers(columns[i % len(columns)], i % 2 == 1))
+            sort["peak_memory_mb"] = Benchmark.peak_memory(lambda: manager.sort_customers("name", True))
+            results.append(sort)
+            
+            results.append(Benchmark.time_calls(
+                "check_duplicate_name", size, queries * 10,
+                lambda i: manager.check_duplicate_name(sample[i % queries]["name"])))
+            
+            new_customers = SyntheticData.customers(queries, seed + 1)
+            results.append(Benchmark.time_calls(
+                "add_customer", size, queries,
+                lambda i: manager.add_customer(f"{new_customers[i]['name']} #{i}", new_customers[i]["email"],
+                                               new_customers[i]["phone"], new_customers[i]["address"],
+                                               new_customers[i]["customer_type"])))
+            
+            save = Benchmark.time_calls("save_customers", size, 3, lambda i: manager.save_customers())
+            save["peak_memory_mb"] = Benchmark.peak_memory(manager.save_customers)
+            results.append(save)
+        return results
+    
+    @staticmethod
+    def run_suite(sizes=(10000, 100000), seed=19, output=None):
+        """Chạy bộ đo cho nhiều kích thước, lưu kết quả JSON để so sánh giữa các phiên bản"""
+        import platform
+        report = {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "results": [result for size in sizes for result in Benchmark.suite_for_size(size, seed)]
+        }
+        if output:
+            DataManager.save_json(output, report)
+        return report
+    
+    @staticmethod
+    def compare_suites(baseline, current):
+        """So sánh p50 của hai lần chạy: tỉ lệ > 1 nghĩa là chậm hơn baseline"""
+        previous = {(r["operation"], r["size"]): r for r in baseline["results"]}
+        comparison = []
+        for result in current["results"]:
+            old = previous.get((result["operation"], result["size"]))
+            if old and old["p50_ms"]:
+                comparison.append({
+                    "operation": result["operation"],
+                    "size": result["size"],
+                    "baseline_p50_ms": old["p50_ms"],
+                    "p50_ms": result["p50_ms"],
+                    "ratio": round(result["p50_ms"] / old["p50_ms"], 2)
+                })
+        return comparison
+    
+    @staticmethod
+    def parse_importtime(stderr, top=10):
+        """Lấy các module cấp cao nhất tốn thời gian nhất từ đầu ra của python -X importtime"""
+        modules = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            # Module cấp cao nhất có đúng một khoảng trắng đứng trước tên
+            if cumulative.strip().isdigit() and name.startswith(" ") and not name.startswith("  "):
+                modules.append({"module": name.strip(), "cumulative_ms": int(cumulative) / 1000})
+        modules.sort(key=lambda m: m["cumulative_ms"], reverse=True)
+        return modules[:top]
+    
+    @staticmethod
+    def cold_start(runs=5, budget_ms=None):
+        """Đo thời gian khởi động lạnh (tới lúc sẵn sàng hiện cửa sổ đăng nhập) trong process mới"""
+        import subprocess
+        budget_ms = budget_ms or float(os.environ.get("CRM_STARTUP_BUDGET_MS", "300"))
+        # Chạy bằng -m để dùng bytecode đã biên dịch trong __pycache__ như khi cài đặt thực tế
+        directory, filename = os.path.split(os.path.abspath(__file__))
+        command = [sys.executable, "-X", "importtime", "-m", os.path.splitext(filename)[0], "startup-probe"]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [directory, os.environ.get("PYTHONPATH")])))
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", env=env)
+            timings.append((time.perf_counter() - start) * 1000)
+            if result.returncode != 0:
+                raise RuntimeError(f"startup-probe lỗi: {result.stderr.strip()[-500:]}")
+        timings.sort()
+        median = timings[len(timings) // 2]
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        return {
+            "runs": runs,
+            "median_ms": round(median, 1),
+            "max_ms": round(timings[-1], 1),
+            "budget_ms": budget_ms,
+            "within_budget": median <= budget_ms,
+            "phases": probe["phases"],
+            "lazy_imports": probe["lazy_imports"],
+            "slowest_imports": Benchmark.parse_importtime(result.stderr)
+        }
+    
+    @staticmethod
+    def api_throughput(total=100000, page_size=1000, concurrency=8):
+        """Đo tốc độ tải dữ liệu từ máy chủ giả lập cục bộ"""
+        server = StubCustomerServer(total).start()
+        try:
+            start = time.perf_counter()
+            customers = APIService.fetch_sample_customers([server.url], page_size, concurrency)
+            elapsed = time.perf_counter() - start
+        finally:
+            server.stop()
+        return {
+            "records": len(customers),
+            "page_size": page_size,
+            "concurrency": concurrency,
+            "seconds": round(elapsed, 3),
+            "records_per_second": round(len(customers) / elapsed) if elapsed else 0
+        }
+    
+    @staticmethod
+    def kdf_calibration(target_ms=250):
+        """Hiệu chỉnh chi phí KDF theo độ trễ mục tiêu trên máy hiện tại"""
+        results = {}
+        algorithms = ["scrypt", "pbkdf2_sha256"] if hasattr(hashlib, "scrypt") else ["pbkdf2_sha256"]
+        for algorithm in algorithms:
+            cost = PasswordHasher.calibrate(target_ms, algorithm)
+            results[algorithm] = {"cost": cost, "ms": round(PasswordHasher.time_hash(algorithm, cost), 1)}
+        return {"target_ms": target_ms, "default": PasswordHasher.algorithm(), "algorithms": results}
+    
+    @staticmethod
+    def customer_memory(n=100000):
+        """So sánh bộ nhớ của danh sách dict và danh sách Customer (__slots__)"""
+        dict_bytes = Benchmark.measure_memory(
+            lambda: [dict(d) for d in Benchmark.sample_customer_dicts(n)])
+        slots_bytes = Benchmark.measure_memory(
+            lambda: [Customer.from_dict(d) for d in Benchmark.sample_customer_dicts(n)])
+        return {
+            "records": n,
+            "dict_bytes": dict_bytes,
+            "slots_bytes": slots_bytes,
+            "dict_bytes_per_record": round(dict_bytes / n, 1),
+            "slots_bytes_per_record": round(slots_bytes / n, 1),
+            "saving_percent": round(100 * (1 - slots_bytes / dict_bytes), 1) if dict_bytes else 0.0
+        }
+
+class SearchIndex:
+    """Chỉ mục trigram để tìm chuỗi con trên các trường của khách hàng"""
+    
+    FIELDS = ("name", "email", "phone", "address")
+    
+    # Bảng bỏ dấu cho str.translate, dựng ở lần dùng đầu tiên
+    FOLD_TABLE = None
+    
+    def __init__(self):
+        # trigram -> array('I') id khách hàng tăng dần: 4 byte mỗi id thay vì một phần tử set
+        self.postings = {}
+        self.texts = {}       # id -> nội dung tìm kiếm đã chuẩn hóa
+        # Loại khách hàng chỉ có vài giá trị nên lưu riêng: loại -> tập id
+        self.type_ids = {}
+    
+    @staticmethod
+    def fold_table():
+        """Bảng chữ có dấu -> chữ không dấu (vd: ễ -> e, đ -> d); dấu tổ hợp rời (chuỗi dạng NFD) bị bỏ"""
+        if SearchIndex.FOLD_TABLE is None:
+            table = {ord("đ"): "d", ord("Đ"): "d"}
+            # Latin-1, Latin mở rộng A/B và Latin mở rộng bổ sung (chứa các chữ tiếng Việt như ạ, ế, ữ)
+            for start, end in ((0x00C0, 0x0250), (0x1E00, 0x1F00)):
+                for code in range(start, end):
+                    base = "".join(c for c in unicodedata.normalize("NFD", chr(code))
+                                   if not unicodedata.combining(c))
+                    if base and base != chr(code):
+                        table[code] = base.lower()
+            for code in range(0x0300, 0x0370):
+                table[code] = None
+            SearchIndex.FOLD_TABLE = table
+        return SearchIndex.FOLD_TABLE
+    
+    @staticmethod
+    def normalize(text):
+        """Chuẩn hóa chuỗi trước khi đánh chỉ mục/tìm kiếm: chữ thường, bỏ dấu tiếng Việt"""
+        # Tra bảng một lượt thay vì NFD từng ký tự; chuỗi ASCII (email, số điện thoại) giữ nguyên
+        text = text.lower()
+        if text.isascii():
+            return text
+        return text.translate(SearchIndex.fold_table())
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def normalize_type(customer_type):
+        """normalize() cho loại khách hàng: chỉ có vài giá trị nên lưu lại kết quả"""
+        return SearchIndex.normalize(customer_type)
+    
+    @classmethod
+    def search_text(cls, customer):
+        """Nội dung tìm kiếm đã chuẩn hóa của khách hàng (các trường nối bằng "\n"), tính một lần rồi lưu trên bản ghi"""
+        text = getattr(customer, "search_key", None)
+        if text is None:
+            text = "\n".join([cls.normalize(customer.get(field) or "") for field in cls.FIELDS])
+            if isinstance(customer, Customer):
+                customer.search_key = text
+        return text
+    
+    @classmethod
+    def field_value(cls, customer, field):
+        """Nội dung đã chuẩn hóa của một trường của khách hàng"""
+        if field in cls.FIELDS:
+            return cls.search_text(customer).split("\n")[cls.FIELDS.index(field)]
+        return cls.normalize_type(customer.get(field) or "")
+    
+    @staticmethod
+    def trigrams(text):
+        """Tập các trigram của chuỗi"""
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    
+    def build(self, customers):
+        """Xây dựng lại toàn bộ chỉ mục"""
+        self.postings = {}
+        self.texts = {}
+        self.type_ids = {}
+        postings = self.postings
+        for customer in customers:
+            customer_id = customer["id"]
+            # Ghi thêm vào cuối rồi sắp xếp một lần ở dưới thay vì chèn giữ thứ tự cho từng id
+            for gram in self.index_fields(customer):
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = array.array("I", (customer_id,))
+                else:
+                    posting.append(customer_id)
+        for gram, posting in postings.items():
+            postings[gram] = array.array("I", sorted(posting))
+    
+    def index_fields(self, customer):
+        """Lưu nội dung đã chuẩn hóa và loại của khách hàng, trả về tập trigram của nó"""
+        customer_id = customer["id"]
+        # Dùng chung chuỗi đã lưu trên bản ghi, không giữ thêm một bản sao
+        text = self.search_text(customer)
+        self.texts[customer_id] = text
+        
+        customer_type = self.normalize_type(customer.get("customer_type") or "")
+        self.type_ids.setdefault(customer_type, set()).add(customer_id)
+        
+        grams = set()
+        for value in text.split("\n"):
+            grams.update(value[i:i + 3] for i in range(len(value) - 2))
+        return grams
+    
+    def add(self, customer):
+        """Thêm khách hàng vào chỉ mục"""
+        customer_id = customer["id"]
+        postings = self.postings
+        for gram in self.index_fields(customer):
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array.array("I", (customer_id,))
+            else:
+                bisect.insort(posting, customer_id)
+    
+    def remove(self, customer_id):
+        """Xóa khách hàng khỏi chỉ mục"""
+        text = self.texts.pop(customer_id, None)
+        if text is None:
+            return
+        for ids in self.type_ids.values():
+            ids.discard(customer_id)
+        for value in text.split("\n"):
+            for gram in self.trigrams(value):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    continue
+                index = bisect.bisect_left(posting, customer_id)
+                if index < len(posting) and posting[index] == customer_id:
+                    del posting[index]
+                    if not posting:
+                        del self.postings[gram]
+    
+    def update(self, customer):
+        """Cập nhật chỉ mục sau khi khách hàng thay đổi"""
+        self.remove(customer["id"])
+        self.add(customer)
+    
+    @classmethod
+    def matches(cls, customer, keyword):
+        """Kiểm tra trực tiếp một khách hàng với từ khóa đã chuẩn hóa (quét tuần tự, không qua chỉ mục)"""
+        # Nội dung đã chuẩn hóa lưu sẵn trên bản ghi: không bỏ dấu lại từng trường ở mỗi lần quét
+        return (keyword in cls.search_text(customer)
+                or keyword in cls.normalize_type(customer.get("customer_type") or ""))
+    
+    def search(self, keyword):
+        """Trả về tập id khách hàng có chứa từ khóa"""
+        keyword = self.normalize(keyword)
+        matches = set()
+        for customer_type, ids in self.type_ids.items():
+            if keyword in customer_type:
+                matches |= ids
+        return matches | self.search_fields(keyword)
+    
+    def search_fields(self, keyword):
+        """Tìm từ khóa (đã chuẩn hóa) trong các trường văn bản"""
+        if len(keyword) < 3:
+            # Từ khóa quá ngắn để dùng trigram: quét nội dung đã chuẩn hóa sẵn
+            return {cid for cid, text in self.texts.items() if keyword in text}
+        
+        postings = []
+        for gram in self.trigrams(keyword):
+            posting = self.postings.get(gram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        
+        # Giao các danh sách bắt đầu từ danh sách ngắn nhất: chi phí theo trigram hiếm nhất
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(posting) > 16 * len(candidates):
+                # Giao với posting dài hơn nhiều tốn ngang (tìm nhị phân từng id) hoặc hơn (duyệt cả posting)
+                # bước kiểm tra chuỗi con bên dưới, nên dừng giao và để bước đó lọc nốt
+                break
+            candidates.intersection_update(posting)
+            if not candidates:
+                return set()
+        
+        # Trigram khớp chưa chắc liền nhau nên cần kiểm tra lại chuỗi con
+        texts = self.texts
+        return {cid for cid in candidates if keyword in texts[cid]}
+    
+    def estimate(self, keyword):
+        """Cận trên số khách hàng chứa từ khóa (đã chuẩn hóa): độ dài posting ngắn nhất, không phải giao tập"""
+        if len(keyword) < 3:
+            return len(self.texts)
+        return min((len(self.postings.get(gram, ())) for gram in self.trigrams(keyword)), default=0)
+    
+    def field_text(self, customer_id, field):
+        """Nội dung đã chuẩn hóa của một trường, lấy từ bản lưu sẵn khi đánh chỉ mục"""
+        return self.texts[customer_id].split("\n")[self.FIELDS.index(field)]
+
+class CustomerQuery:
+    """Truy vấn theo trường trong ô tìm kiếm, vd: type:VIP name:"trần" email:gmail.com created:2025-01..2025-06"""
+    
+    # Tên trường trong truy vấn (kể cả tên tiếng Việt không dấu) -> trường của khách hàng
+    FIELDS = {
+        "name": "name", "ten": "name",
+        "email": "email",
+        "phone": "phone", "sdt": "phone",
+        "address": "address", "diachi": "address",
+        "type": "customer_type", "loai": "customer_type",
+        "created": "created_date", "ngay": "created_date",
+    }
+    # [trường:](giá trị trong ngoặc kép, có thể chưa đóng khi đang gõ | một từ, có thể rỗng)
+    TOKEN = re.compile(r'(?:([^\W\d]\w*):)?(?:"([^"]*)"?|(\S*))')
+    
+    def __init__(self, terms):
+        # (trường, giá trị đã chuẩn hóa); trường None: tìm trên mọi trường như từ khóa thường;
+        # created_date: giá trị là (từ, đến) so theo tiền tố chuỗi ngày, "" là không giới hạn
+        self.terms = terms
+    
+    @classmethod
+    def field_of(cls, name):
+        """Trường của khách hàng ứng với tên trong truy vấn (None nếu không phải tên trường)"""
+        return cls.FIELDS.get(SearchIndex.normalize(name)) if name else None
+    
+    @classmethod
+    def is_query(cls, text):
+        """Chuỗi có dùng cú pháp trường:giá_trị hay chỉ là từ khóa thường"""
+        return ":" in text and any(cls.field_of(match.group(1)) for match in cls.TOKEN.finditer(text))
+    
+    @classmethod
+    def parse(cls, text):
+        """Tách chuỗi thành các điều kiện; các từ không có tên trường gộp thành một cụm tìm trên mọi trường"""
+        terms = []
+        words = []
+        for match in cls.TOKEN.finditer(text):
+            name, quoted, bare = match.groups()
+            value = (quoted if quoted is not None else bare).strip()
+            field = cls.field_of(name)
+            if field is None:
+                words.append(match.group(0) if name else value)
+            elif not value:
+                # Đang gõ dở, vd: "email:"
+                continue
+            elif field == "created_date":
+                start, separator, end = value.partition("..")
+                terms.append((field, (start, end if separator else start)))
+            else:
+                terms.append((field, SearchIndex.normalize(value)))
+        phrase = SearchIndex.normalize(" ".join(word for word in words if word))
+        if phrase:
+            terms.append((None, phrase))
+        return cls(terms)
+    
+    @staticmethod
+    def in_range(created, bounds):
+        """Ngày tạo nằm trong khoảng (hai đầu tính theo tiền tố, vd: 2025-06 gồm cả tháng 6)"""
+        start, end = bounds
+        return created >= start and (not end or created[:len(end)] <= end)
+    
+    def matches(self, customer):
+        """Kiểm tra trực tiếp một khách hàng (quét tuần tự, không dùng chỉ mục)"""
+        for field, value in self.terms:
+            if field is None:
+                if not SearchIndex.matches(customer, value):
+                    return False
+            elif field == "created_date":
+                if not self.in_range(customer.get("created_date") or "", value):
+                    return False
+            elif value not in SearchIndex.field_value(customer, field):
+                return False
+        return True
+
+class CustomerSnapshot:
+    """Một phiên bản dữ liệu khách hàng đã công bố: không bị sửa sau đó nên luồng khác đọc không cần khóa"""
+    
+    __slots__ = ("version", "customers")
+    
+    def __init__(self, version, customers):
+        self.version = version
+        self.customers = customers  # CustomerList: cả danh sách lẫn bản ghi không bị sửa tại chỗ
+
+class CustomerList:
+    """Danh sách khách hàng bất biến, chia thành các đoạn để bản nháp chỉ sao chép những đoạn bị sửa"""
+    
+    CHUNK = 512     # số khách hàng tối đa của một đoạn
+    
+    def __init__(self, customers=()):
+        customers = customers if isinstance(customers, list) else list(customers)
+        self._set_chunks([customers[i:i + self.CHUNK] for i in range(0, len(customers), self.CHUNK)])
+    
+    def _set_chunks(self, chunks):
+        """Gắn các đoạn và tính vị trí bắt đầu của từng đoạn"""
+        self._chunks = chunks
+        self._starts = list(itertools.accumulate(map(len, chunks), initial=0))
+        self._length = self._starts.pop()
+    
+    def __len__(self):
+        return self._length
+    
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._chunks)
+    
+    def _locate(self, index):
+        """(đoạn, vị trí trong đoạn) của chỉ số index"""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Chỉ số khách hàng ngoài phạm vi")
+        chunk = bisect.bisect_right(self._starts, index) - 1
+        return chunk, index - self._starts[chunk]
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            rows = []
+            if start < stop:
+                chunk, offset = self._locate(start)
+                while len(rows) < stop - start:
+                    rows.extend(self._chunks[chunk][offset:offset + stop - start - len(rows)])
+                    chunk, offset = chunk + 1, 0
+            return rows
+        chunk, offset = self._locate(index)
+        return self._chunks[chunk][offset]
+    
+    def index(self, customer):
+        """Vị trí đầu tiên của khách hàng (như list.index)"""
+        for start, rows in zip(self._starts, self._chunks):
+            try:
+                return start + rows.index(customer)
+            except ValueError:
+                pass
+        raise ValueError("Không có khách hàng trong danh sách")
+
+class CustomerListDraft(CustomerList):
+    """Bản nháp riêng của một lần ghi: dùng chung các đoạn với phiên bản gốc, sao chép đoạn ở lần sửa đầu tiên"""
+    
+    def __init__(self, base):
+        self._chunks = list(base._chunks)
+        self._starts = list(base._starts)
+        self._length = base._length
+        self._owned = set()     # id các đoạn đã sao chép riêng cho bản nháp (không còn dùng chung)
+    
+    def _own(self, chunk):
+        """Đoạn thứ chunk, sao chép trước nếu còn dùng chung với phiên bản đã công bố"""
+        rows = self._chunks[chunk]
+        if id(rows) not in self._owned:
+            rows = list(rows)
+            self._chunks[chunk] = rows
+            self._owned.add(id(rows))
+        return rows
+    
+    def append(self, customer):
+        if not self._chunks or len(self._chunks[-1]) >= self.CHUNK:
+            self._chunks.append([])
+            self._starts.append(self._length)
+            self._owned.add(id(self._chunks[-1]))
+        self._own(len(self._chunks) - 1).append(customer)
+        self._length += 1
+    
+    def __setitem__(self, index, customer):
+        chunk, offset = self._locate(index)
+        self._own(chunk)[offset] = customer
+    
+    def __delitem__(self, index):
+        chunk, offset = self._locate(index)
+        rows = self._own(chunk)
+        del rows[offset]
+        if rows:
+            chunk += 1
+        else:
+            self._owned.discard(id(rows))
+            del self._chunks[chunk]
+            del self._starts[chunk]
+        for i in range(chunk, len(self._starts)):
+            self._starts[i] -= 1
+        self._length -= 1
+    
+    def freeze(self):
+        """Phiên bản bất biến để công bố; bản nháp không được sửa tiếp sau đó"""
+        customers = CustomerList.__new__(CustomerList)
+        customers._chunks, customers._starts, customers._length = self._chunks, self._starts, self._length
+        return customers
+
+class SQLiteCustomerList:
+    """Danh sách khách hàng ảo trên SQLite: đếm bằng COUNT, đọc từng đoạn bằng LIMIT/OFFSET theo thứ tự cột"""
+    
+    def __init__(self, storage, column=None, reverse=False):
+        self.storage = storage
+        self.column = column
+        self.reverse = reverse
+        self._count = None  # mỗi lần dữ liệu đổi là một danh sách mới nên đếm một lần là đủ
+    
+    def __len__(self):
+        if self._count is None:
+            self._count = self.storage.count()
+        return self._count
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self.storage.page(self.column, self.reverse, start, max(0, stop - start))
+        if index < 0:
+            index += len(self)
+        rows = self.storage.page(self.column, self.reverse, index, 1) if index >= 0 else []
+        if not rows:
+            raise IndexError("Chỉ số khách hàng ngoài phạm vi")
+        return rows[0]
+    
+    def __iter__(self):
+        return self.storage.iter_sorted(self.column, self.reverse)
+
+class CustomerManager:
+    """Class quản lý khách hàng"""
+    
+    # Khóa sắp xếp của từng cột
+    SORT_KEYS = {
+        "name": lambda c: c["name"].lower(),
+        "email": lambda c: c["email"].lower(),
+        "phone": lambda c: c["phone"],
+        "customer_type": lambda c: c.get("customer_type", "").lower(),
+        "created_date": lambda c: c.get("created_date", ""),
+        "id": lambda c: c["id"],
+    }
+    
+    # Thời gian tìm kiếm/sắp xếp chờ khóa trước khi quét thẳng phiên bản đã công bố
+    LOCK_WAIT = 0.05
+    
+    def __init__(self, storage=None, use_journal=True, saver=None):
+        self.customers_file = "customers.json"
+        if storage is None:
+            # Chế độ nhật ký: mỗi thay đổi chỉ ghi thêm một dòng thay vì ghi lại cả file
+            journal = ChangeJournal("customers.journal") if use_journal else None
+            storage = JsonStorage(self.customers_file, journal, saver)
+        self.storage = storage
+        # Khóa giữa các luồng ghi và chỉ mục; luồng chỉ đọc danh sách dùng phiên bản đã công bố
+        self.lock = threading.RLock()
+        self._snapshot = CustomerSnapshot(0, CustomerList())
+        self._draft = None      # CustomerListDraft riêng của lần ghi đang diễn ra, chưa công bố
+        # Chỉ mục tìm kiếm được dựng ở luồng nền (ngoài khóa) rồi gắn vào khi xong; trong lúc chờ thì quét tuần tự
+        self.search_index = None
+        self._search_index_stale = True
+        self._index_generation = 0  # tăng mỗi khi dữ liệu được nạp lại, bản dựng dở của lần nạp cũ bị bỏ
+        self._index_backlog = None  # (id, khách hàng hoặc None) thay đổi trong lúc đang dựng chỉ mục
+        self._index_thread = None
+        self._positions = None  # id -> vị trí trong self.customers, tính lại khi cần
+        self._positions_stale_from = None  # vị trí từ đó trở đi bị lệch do xóa, sửa lại ở lần dùng tới
+        self._by_id = {}        # id -> khách hàng
+        self._name_index = {}   # tên đã chuẩn hóa -> tập id
+        self._sort_orders = {}  # cột -> danh sách (khóa, id) tăng dần, dùng lại giữa các lần sắp xếp
+        self._sorted_lists = {}  # (cột, giảm dần) -> CustomerList đã sắp xếp, bỏ đi khi dữ liệu đổi
+        self.last_id = 0        # id đã cấp gần nhất, không bao giờ giảm
+        with gc_paused():
+            self.customers = self.load_customers()
+            self.rebuild_indexes()
+        self.sort_column = None
+        self.sort_reverse = False
+        # Định nghĩa các loại khách hàng
+        self.customer_types = ["Khách hàng thường", "Khách hàng VIP"]
+    
+    @property
+    def customers(self):
+        """Danh sách khách hàng của phiên bản đang công bố (chỉ đọc, không bao giờ bị sửa tại chỗ)"""
+        return self._snapshot.customers
+    
+    @customers.setter
+    def customers(self, customers):
+        # Gán danh sách mới là công bố phiên bản mới (một phép gán tham chiếu); bản nháp bị thay thế
+        if isinstance(customers, list):
+            customers = CustomerList(customers)
+        self._draft = None
+        self._snapshot = CustomerSnapshot(self._snapshot.version + 1, customers)
+    
+    @property
+    def version(self):
+        """Số hiệu phiên bản đang công bố, tăng sau mỗi lần dữ liệu đổi"""
+        return self._snapshot.version
+    
+    def snapshot(self):
+        """Phiên bản đang công bố (số hiệu và danh sách đi cùng nhau)"""
+        return self._snapshot
+    
+    def publish(self):
+        """Công bố bản nháp của lần ghi hiện tại thành phiên bản mới"""
+        if self._draft is not None:
+            self.customers = self._draft.freeze()
+    
+    def _latest(self):
+        """Danh sách mới nhất cho các thao tác trong khóa: bản nháp nếu đang ghi, không thì phiên bản đã công bố"""
+        return self._draft if self._draft is not None else self._snapshot.customers
+    
+    def _working_list(self):
+        """Bản nháp để sửa; phiên bản đã công bố không bao giờ bị sửa, chỉ được thay khi publish"""
+        if self._draft is None:
+            self._draft = CustomerListDraft(self._snapshot.customers)
+        return self._draft
+    
+    @Metrics.timed()
+    def load_customers(self):
+        """Tải danh sách khách hàng (lưu trong bộ nhớ dưới dạng Customer)"""
+        return [Customer.from_dict(record) for record in self.storage.iter_records()]
+    
+    @Metrics.timed()
+    def save_customers(self):
+        """Lưu danh sách khách hàng"""
+        with self.exclusive():
+            self.storage.save_meta({"last_id": self.last_id})
+            return self.storage.save_all(self._latest())
+    
+    @Metrics.timed()
+    def compact(self):
+        """Nén dữ liệu lưu trữ: ghi snapshot mới và cắt nhật ký (SQLite: VACUUM)"""
+        with self.exclusive():
+            self.storage.save_meta({"last_id": self.last_id})
+            return self.storage.compact(self._latest()) is not False
+    
+    @Metrics.timed()
+    def reload(self):
+        """Tải lại dữ liệu từ nơi lưu trữ"""
+        with self.lock:
+            self.customers = self.load_customers()
+            self.rebuild_indexes()
+    
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Giữ khóa luồng và khóa file, áp dụng thay đổi của phiên bản khác trước khi sửa dữ liệu"""
+        with self.lock, self.storage.locked():
+            try:
+                self.sync_external_changes()
+                self.publish()
+                yield
+            finally:
+                self.publish()
+    
+    def sync_external_changes(self):
+        """Áp dụng các thay đổi do phiên bản khác ghi (gọi khi đang giữ khóa); trả về True nếu dữ liệu đổi"""
+        changes = self.storage.read_external_changes()
+        if changes is None:
+            self.reload()
+            return True
+        if not changes:
+            return False
+        # Gộp theo từng bản ghi: mọi lần ghi đều giữ khóa file nên thứ tự trong nhật ký là thứ tự thật,
+        # không phụ thuộc đồng hồ (có thể lệch) của từng máy
+        for customer_id, record in changes.items():
+            current = self.get_customer(customer_id)
+            if record is None:
+                if current is not None:
+                    self._remove_customer(current)
+            elif current is None:
+                self._append_customer(Customer.from_dict(record))
+            else:
+                self._replace_customer(current, Customer.from_dict(record))
+        stored_last_id = self.storage.load_meta().get("last_id", 0)
+        self.last_id = max(self.last_id, stored_last_id, max(changes))
+        return True
+    
+    @Metrics.timed()
+    def refresh_if_changed(self):
+        """Làm mới khi phiên bản khác đã ghi: chỉ đọc phần nhật ký mới, tải lại cả file khi snapshot bị thay"""
+        if not self.storage.has_external_changes():
+            return False
+        with self.lock, self.storage.locked():
+            try:
+                return self.sync_external_changes()
+            finally:
+                self.publish()
+    
+    def rebuild_indexes(self):
+        """Xây dựng lại các chỉ mục từ danh sách khách hàng"""
+        self._by_id = {}
+        self._name_index = {}
+        search_text = SearchIndex.search_text
+        for customer in self._latest():
+            self._by_id[customer["id"]] = customer
+            self._name_index.setdefault(self.name_key(customer["name"]), set()).add(customer["id"])
+            # Chuẩn hóa sẵn một lần khi nạp: tìm kiếm trong lúc chỉ mục đang dựng quét các chuỗi này
+            search_text(customer)
+        
+        self._sort_orders = {}
+        self._sorted_lists = {}
+        
+        stored_last_id = self.storage.load_meta().get("last_id", 0)
+        self.last_id = max(self.last_id, stored_last_id, max(self._by_id, default=0))
+        
+        # Chỉ mục tìm kiếm được dựng lại ở lần tìm kiếm tiếp theo
+        self.search_index = None
+        self._search_index_stale = True
+        self._index_generation += 1
+        self._index_backlog = None
+        self._positions = None
+        self._positions_stale_from = None
+    
+    @staticmethod
+    def name_key(name):
+        """Khóa so sánh tên (không phân biệt hoa thường, bỏ khoảng trắng hai đầu)"""
+        return name.lower().strip()
+    
+    def get_customer(self, customer_id):
+        """Lấy khách hàng theo id"""
+        return self._by_id.get(customer_id)
+    
+    def next_id(self):
+        """Cấp id mới cho khách hàng"""
+        self.last_id += 1
+        return self.last_id
+    
+    def _index_customer(self, customer):
+        """Thêm khách hàng vào các chỉ mục"""
+        SearchIndex.search_text(customer)
+        self._by_id[customer["id"]] = customer
+        self._name_index.setdefault(self.name_key(customer["name"]), set()).add(customer["id"])
+        if not self._search_index_stale:
+            self.search_index.add(customer)
+        elif self._index_backlog is not None:
+            self._index_backlog.append((customer["id"], customer))
+        if self._sorted_lists:
+            self._sorted_lists = {}
+        for column, order in self._sort_orders.items():
+            bisect.insort(order, (self.SORT_KEYS[column](customer), customer["id"]))
+    
+    def _unindex_customer(self, customer):
+        """Xóa khách hàng khỏi các chỉ mục"""
+        self._by_id.pop(customer["id"], None)
+        key = self.name_key(customer["name"])
+        ids = self._name_index.get(key)
+        if ids is not None:
+            ids.discard(customer["id"])
+            if not ids:
+                del self._name_index[key]
+        if not self._search_index_stale:
+            self.search_index.remove(customer["id"])
+        elif self._index_backlog is not None:
+            self._index_backlog.append((customer["id"], None))
+        if self._sorted_lists:
+            self._sorted_lists = {}
+        for column, order in self._sort_orders.items():
+            entry = (self.SORT_KEYS[column](customer), customer["id"])
+            index = bisect.bisect_left(order, entry)
+            if index < len(order) and order[index] == entry:
+                del order[index]
+    
+    def get_search_index(self):
+        """Chỉ mục tìm kiếm (gọi khi đang giữ khóa); None nếu chưa dựng xong, khi đó bắt đầu dựng ở luồng nền"""
+        if self._search_index_stale:
+            self.start_index_build()
+            return None
+        return self.search_index
+    
+    def start_index_build(self):
+        """Dựng chỉ mục tìm kiếm ở luồng nền nếu chưa có (vd: ngay sau khi tải dữ liệu)"""
+        with self.lock:
+            if self._search_index_stale and (self._index_thread is None or not self._index_thread.is_alive()):
+                self._index_thread = threading.Thread(target=self.build_search_index, daemon=True)
+                self._index_thread.start()
+    
+    @Metrics.timed()
+    def build_search_index(self):
+        """Dựng chỉ mục từ phiên bản đã công bố mà không giữ khóa, áp dụng các thay đổi trong lúc dựng rồi gắn vào"""
+        while True:
+            with self.lock:
+                if not self._search_index_stale:
+                    return self.search_index
+                generation = self._index_generation
+                customers = self.customers
+                self._index_backlog = []
+            
+            index = SearchIndex()
+            index.build(customers)
+            # Thứ tự ngày tạo cho truy vấn created: cũng sắp xếp ở đây, không để lần truy vấn đầu sắp xếp khi giữ khóa
+            key = self.SORT_KEYS["created_date"]
+            dates = sorted((key(c), c["id"]) for c in customers)
+            
+            with self.lock:
+                if generation == self._index_generation:
+                    changed = set()
+                    for customer_id, customer in self._index_backlog:
+                        index.remove(customer_id)
+                        if customer is not None:
+                            index.add(customer)
+                        changed.add(customer_id)
+                    if "created_date" not in self._sort_orders:
+                        if changed:
+                            # Đặt lại vị trí các khách hàng đổi trong lúc dựng theo dữ liệu hiện tại
+                            dates = [entry for entry in dates if entry[1] not in changed]
+                            for customer_id in changed:
+                                customer = self._by_id.get(customer_id)
+                                if customer is not None:
+                                    bisect.insort(dates, (key(customer), customer_id))
+                        self._sort_orders["created_date"] = dates
+                    self._index_backlog = None
+                    self.search_index = index
+                    self._search_index_stale = False
+                    return index
+                # Dữ liệu được nạp lại trong lúc dựng: dựng lại từ phiên bản mới
+    
+    def wait_search_index(self):
+        """Chờ chỉ mục tìm kiếm sẵn sàng (khi cần dùng ngay, vd: giải thích kế hoạch truy vấn, đo hiệu năng)"""
+        thread = self._index_thread
+        if thread is not None:
+            thread.join()
+        return self.build_search_index()
+    
+    def get_positions(self):
+        """Bảng id -> vị trí của khách hàng trong danh sách hiện tại"""
+        customers = self._latest()
+        if self._positions is None:
+            self._positions = {c["id"]: i for i, c in enumerate(customers)}
+        elif self._positions_stale_from is not None:
+            # Sau các lần xóa chỉ phần phía sau vị trí xóa đầu tiên bị lệch: sửa một lượt
+            start = self._positions_stale_from
+            self._positions.update(zip(map(operator.itemgetter("id"), customers[start:]),
+                                       range(start, len(customers))))
+        self._positions_stale_from = None
+        return self._positions
+    
+    def position_of(self, customer):
+        """Vị trí của khách hàng trong danh sách đang sửa (bảng vị trí nếu còn đúng, không thì list.index)"""
+        customers = self._latest()
+        position = self._positions.get(customer["id"]) if self._positions is not None else None
+        if position is None or position >= len(customers) or customers[position] is not customer:
+            position = customers.index(customer)
+        return position
+    
+    def persist_change(self, op, record=None, record_id=None):
+        """Lưu một thay đổi qua storage (nhật ký, SQLite hoặc ghi lại cả file)"""
+        return self.storage.apply(op, record, record_id, self._latest())
+    
+    def check_duplicate_name(self, name, exclude_id=None):
+        """Kiểm tra trùng tên khách hàng (không phân biệt hoa thường)"""
+        ids = self._name_index.get(self.name_key(name))
+        if not ids:
+            return False
+        return len(ids) > 1 or exclude_id not in ids
+    
+    @Metrics.timed()
+    def add_customer(self, name, email, phone, address, customer_type="Khách hàng thường"):
+        """Thêm khách hàng mới"""
+        try:
+            with self.exclusive():
+                if self.check_duplicate_name(name):
+                    return False, "Tên khách hàng đã tồn tại!"
+                
+                # Kiểm tra loại khách hàng hợp lệ
+                if customer_type not in self.customer_types:
+                    customer_type = "Khách hàng thường"
+                
+                new_id = self.next_id()
+                new_customer = Customer(
+                    id=new_id,
+                    name=name,
+                    email=email,
+                    phone=phone,
+                    address=address,
+                    customer_type=customer_type,
+                    created_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                )
+                
+                self._append_customer(new_customer)
+                return self.persist_change("put", new_customer), "Thêm khách hàng thành công!"
+        except TimeoutError as e:
+            return False, str(e)
+    
+    def _append_customer(self, customer):
+        """Thêm khách hàng vào cuối danh sách và các chỉ mục"""
+        customers = self._working_list()
+        customers.append(customer)
+        self._index_customer(customer)
+        if self._positions is not None:
+            self._positions[customer["id"]] = len(customers) - 1
+    
+    def _replace_customer(self, old, new):
+        """Thay bản ghi khách hàng bằng bản mới (bản cũ giữ nguyên cho các phiên bản trước)"""
+        position = self.position_of(old)
+        self._unindex_customer(old)
+        self._working_list()[position] = new
+        self._index_customer(new)
+    
+    def _remove_customer(self, customer):
+        """Xóa khách hàng khỏi danh sách và các chỉ mục"""
+        position = self.position_of(customer)
+        del self._working_list()[position]
+        if self._positions is not None:
+            # Các khách hàng phía sau lùi lên một ô: chỉ đánh dấu, bảng vị trí được sửa khi cần dùng
+            del self._positions[customer["id"]]
+            if self._positions_stale_from is None or position < self._positions_stale_from:
+                self._positions_stale_from = position
+        self._unindex_customer(customer)
+    
+    @Metrics.timed()
+    def update_customer(self, customer_id, name, email, phone, address, customer_type="Khách hàng thường"):
+        """Cập nhật thông tin khách hàng"""
+        try:
+            with self.exclusive():
+                if self.check_duplicate_name(name, exclude_id=customer_id):
+                    return False, "Tên khách hàng đã tồn tại!"
+                
+                # Kiểm tra loại khách hàng hợp lệ
+                if customer_type not in self.customer_types:
+                    customer_type = "Khách hàng thường"
+                
+                customer = self.get_customer(customer_id)
+                if customer is None:
+                    return False, "Không tìm thấy khách hàng!"
+                
+                # Tạo bản ghi mới thay vì sửa tại chỗ: luồng đang đọc phiên bản cũ không thấy dữ liệu nửa vời
+                updated = customer.copy()
+                updated["name"] = name
+                updated["email"] = email
+                updated["phone"] = phone
+                updated["address"] = address
+                updated["customer_type"] = customer_type
+                updated["updated_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self._replace_customer(customer, updated)
+                return self.persist_change("put", updated), "Cập nhật khách hàng thành công!"
+        except TimeoutError as e:
+            return False, str(e)
+    
+    @Metrics.timed()
+    def delete_customer(self, customer_id):
+        """Xóa khách hàng"""
+        try:
+            with self.exclusive():
+                customer = self.get_customer(customer_id)
+                if customer is None:
+                    return False
+                
+                self._remove_customer(customer)
+                if customer_id == self.last_id:
+                    # Lưu lại id lớn nhất để không cấp trùng sau khi xóa
+                    self.storage.save_meta({"last_id": self.last_id})
+                return self.persist_change("del", record_id=customer_id)
+        except TimeoutError as e:
+            print(f"Lỗi xóa khách hàng: {e}")
+            return False
+    
+    @Metrics.timed()
+    def search_customers(self, keyword):
+        """Tìm kiếm khách hàng bằng chỉ mục trigram, giữ nguyên thứ tự danh sách"""
+        if not self.lock.acquire(timeout=self.LOCK_WAIT):
+            # Đang có lần ghi dài (import, gộp dữ liệu): quét phiên bản đã công bố thay vì chờ
+            return self.scan_customers(self.customers, keyword)
+        try:
+            ids = self.match_ids(keyword)
+            if ids is not None:
+                customers = self._latest()
+                if len(ids) * 8 > len(customers):
+                    # Kết quả chiếm phần lớn danh sách: lọc tuần tự rẻ hơn sắp xếp theo vị trí
+                    return [c for c in customers if c["id"] in ids]
+                positions = self.get_positions()
+                by_id = self._by_id
+                return [by_id[cid] for cid in sorted(ids, key=positions.__getitem__)]
+        finally:
+            self.lock.release()
+        # Chỉ mục đang được dựng ở luồng nền: quét tuần tự ngoài khóa
+        return self.scan_customers(self.customers, keyword)
+    
+    @staticmethod
+    def matcher(keyword):
+        """Hàm kiểm tra một khách hàng với từ khóa thường hoặc truy vấn theo trường (không dùng chỉ mục)"""
+        if CustomerQuery.is_query(keyword):
+            return CustomerQuery.parse(keyword).matches
+        keyword = SearchIndex.normalize(keyword)
+        return lambda customer: SearchIndex.matches(customer, keyword)
+    
+    @staticmethod
+    def scan_customers(customers, keyword):
+        """Tìm tuần tự (không dùng chỉ mục, không cần khóa) trên một phiên bản danh sách"""
+        match = CustomerManager.matcher(keyword)
+        return [c for c in customers if match(c)]
+    
+    def match_ids(self, keyword):
+        """Tập id khớp từ khóa thường hoặc truy vấn theo trường (gọi khi đang giữ khóa); None nếu chưa có chỉ mục"""
+        if CustomerQuery.is_query(keyword):
+            return self.run_query(CustomerQuery.parse(keyword))
+        index = self.get_search_index()
+        return index.search(keyword) if index is not None else None
+    
+    def plan_query(self, query):
+        """Ước lượng số dòng của từng điều kiện bằng cấu trúc rẻ nhất cho nó, xếp điều kiện hẹp nhất lên đầu"""
+        index = self.get_search_index()
+        if index is None:
+            return None
+        steps = []
+        for field, value in query.terms:
+            step = {"field": field, "value": value}
+            if field == "customer_type":
+                # Chỉ có vài loại khách hàng: bảng loại -> tập id cho số dòng chính xác
+                step["types"] = [t for t in index.type_ids if value in t]
+                step["strategy"] = "type_map"
+                step["estimate"] = sum(len(index.type_ids[t]) for t in step["types"])
+            elif field == "created_date":
+                # Thứ tự (ngày tạo, id) đã sắp xếp: hai lần tìm nhị phân cho khoảng ngày
+                order = self.get_sort_order("created_date")
+                start, end = value
+                first = bisect.bisect_left(order, (start,))
+                last = bisect.bisect_left(order, (end + "\uffff",)) if end else len(order)
+                step["range"] = (first, max(first, last))
+                step["strategy"] = "date_range"
+                step["estimate"] = max(0, last - first)
+            else:
+                step["strategy"] = "trigram" if len(value) >= 3 else "scan"
+                step["estimate"] = index.estimate(value)
+            steps.append(step)
+        steps.sort(key=lambda step: step["estimate"])
+        return steps
+    
+    def run_query(self, query):
+        """Điều kiện hẹp nhất sinh tập ứng viên, các điều kiện sau chỉ kiểm tra trên ứng viên còn lại"""
+        steps = self.plan_query(query)
+        if steps is None:
+            return None
+        if not steps:
+            return set(self._by_id)
+        ids = self.query_candidates(steps[0])
+        for step in steps[1:]:
+            if not ids:
                 break
-        
-        if self.save_users():
-            return True, "Đổi mật khẩu thành công"
-        return False, "Lỗi lưu dữ liệu"
+            ids = {cid for cid in ids if self.query_matches(step, cid)}
+        return ids
     
-    def reset_password(self, username, security_answer):
-        """Đặt lại mật khẩu"""
-        hashed_answer = self.hash_password(security_answer.lower())
-        for user in self.users:
-            if user["username"] == username and user.get("security_answer") == hashed_answer:
-                new_password = self.generate_random_password()
-                user["password"] = self.hash_password(new_password)
-                user["password_reset_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                if self.save_users():
-                    return True, new_password
-                return False, "Lỗi lưu dữ liệu"
-        return False, "Thông tin không chính xác"
+    def query_candidates(self, step):
+        """Tập id thỏa một điều kiện, lấy trực tiếp từ cấu trúc mà kế hoạch đã chọn"""
+        index = self.search_index
+        field, value = step["field"], step["value"]
+        if step["strategy"] == "type_map":
+            return set().union(*(index.type_ids[t] for t in step["types"]))
+        if step["strategy"] == "date_range":
+            first, last = step["range"]
+            return {cid for _, cid in self._sort_orders["created_date"][first:last]}
+        if field is None:
+            return index.search(value)
+        return {cid for cid in index.search_fields(value) if value in index.field_text(cid, field)}
     
-    def get_user_by_username(self, username):
-        """Lấy thông tin user theo username"""
-        for user in self.users:
-            if user["username"] == username:
-                return user
-        return None
+    def query_matches(self, step, customer_id):
+        """Kiểm tra một điều kiện trên một ứng viên bằng dữ liệu đã chuẩn hóa sẵn"""
+        index = self.search_index
+        field, value = step["field"], step["value"]
+        if step["strategy"] == "type_map":
+            return any(customer_id in index.type_ids[t] for t in step["types"])
+        if step["strategy"] == "date_range":
+            return CustomerQuery.in_range(self._by_id[customer_id].get("created_date") or "", value)
+        if field is None:
+            return value in index.texts[customer_id] or any(
+                customer_id in ids for t, ids in index.type_ids.items() if value in t)
+        return value in index.field_text(customer_id, field)
     
-    def is_admin(self):
-        """Kiểm tra quyền admin"""
-        return self.current_user and self.current_user["role"] == "admin"
+    def explain_query(self, keyword):
+        """Kế hoạch thực hiện truy vấn (để kiểm tra planner), điều kiện đầu tiên sinh tập ứng viên"""
+        steps = None
+        while steps is None:
+            self.wait_search_index()
+            with self.lock:
+                steps = self.plan_query(CustomerQuery.parse(keyword))
+        return [{"field": step["field"] or "*", "value": step["value"], "strategy": step["strategy"],
+                 "estimate": step["estimate"], "role": "driver" if i == 0 else "filter"}
+                for i, step in enumerate(steps)]
     
-    def can_edit_customers(self):
-        """Kiểm tra quyền sửa khách hàng - chỉ admin mới được sửa"""
-        return self.is_admin()
+    def get_sort_order(self, column):
+        """Thứ tự (khóa, id) tăng dần của cột, tính một lần rồi cập nhật dần khi dữ liệu đổi"""
+        order = self._sort_orders.get(column)
+        if order is None:
+            key = self.SORT_KEYS[column]
+            order = sorted((key(c), c["id"]) for c in self._latest())
+            self._sort_orders[column] = order
+        return order
     
-    def can_add_customers(self):
-        """Kiểm tra quyền thêm khách hàng - cả admin và user đều được thêm"""
-        return self.current_user is not None
+    @Metrics.timed()
+    def sort_customers(self, column, reverse=False, keyword=None):
+        """Sắp xếp khách hàng theo cột; nếu có từ khóa thì trả về kết quả tìm kiếm theo thứ tự đó"""
+        if not self.lock.acquire(timeout=self.LOCK_WAIT):
+            # Đang có lần ghi dài: sắp xếp bản sao của phiên bản đã công bố, không làm treo giao diện
+            customers = self.scan_customers(self.customers, keyword) if keyword else self.customers
+            key = self.SORT_KEYS.get(column)
+            if key is None:
+                return list(customers)
+            return sorted(customers, key=lambda c: (key(c), c["id"]), reverse=reverse)
+        try:
+            if column not in self.SORT_KEYS:
+                return self.search_customers(keyword) if keyword else self.customers
+            
+            self.sort_column = column
+            self.sort_reverse = reverse
+            
+            by_id = self._by_id
+            # Danh sách đã sắp xếp được giữ lại tới khi dữ liệu đổi: đổi qua lại giữa các cột chỉ là
+            # công bố lại một danh sách có sẵn (gán một tham chiếu)
+            customers = self._sorted_lists.get((column, reverse))
+            if customers is None:
+                ids = [cid for _, cid in self.get_sort_order(column)]
+                if reverse:
+                    ids.reverse()
+                customers = CustomerList([by_id[cid] for cid in ids])
+                self._sorted_lists[(column, reverse)] = customers
+            if customers is not self._latest():
+                self.customers = customers
+                self._positions = None
+            
+            if not keyword:
+                return customers
+            
+            # Giao kết quả tìm kiếm với thứ tự đã có trong một lượt
+            matches = self.match_ids(keyword)
+            if matches is None:
+                matches = {c["id"] for c in self.scan_customers(customers, keyword)}
+            if len(matches) * 8 > len(customers):
+                return [c for c in customers if c["id"] in matches]
+            key = self.SORT_KEYS[column]
+            return sorted((by_id[cid] for cid in matches),
+                          key=lambda c: (key(c), c["id"]), reverse=reverse)
+        finally:
+            self.lock.release()
     
-    def logout(self):
-        """Đăng xuất"""
-        self.current_user = None
-
-class APIService:
-    """Class tích hợp API để lấy dữ liệu mẫu"""
+    IMPORT_FIELDS = ("name", "email", "phone", "address", "customer_type", "created_date")
     
     @staticmethod
-    def fetch_sample_customers():
-        """Lấy dữ liệu khách hàng mẫu từ API"""
-        try:
-            response = requests.get("https://jsonplaceholder.typicode.com/users", timeout=10)
-            if response.status_code == 200:
-                users_data = response.json()
-                customers = []
+    def iter_import_rows(filename, file_format=None):
+        """Đọc lần lượt các dòng của file CSV hoặc NDJSON cần import: (số dòng trong file, dòng, lỗi đọc)"""
+        if file_format is None:
+            file_format = "csv" if filename.lower().endswith(".csv") else "ndjson"
+        if file_format == "csv":
+            with open(filename, 'r', encoding='utf-8-sig', newline='') as file:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    yield reader.line_num, row, None
+        else:
+            for line_number, row, error in DataManager.iter_ndjson_rows(filename):
+                if not error and not isinstance(row, dict):
+                    row, error = None, "Dòng không phải đối tượng JSON"
+                yield line_number, row, error
+    
+    @Metrics.timed()
+    def bulk_import(self, filename, file_format=None, chunk_size=5000, workers=1):
+        """Import hàng loạt từ CSV/NDJSON, lưu theo lô; workers > 1 thì kiểm tra dữ liệu trên nhiều process"""
+        # Mặc định kiểm tra ngay trong tiến trình (100k dòng chưa tới 1 giây): tạo process tốn hơn thế,
+        # và giao diện gọi hàm này khi đang có nhiều luồng chạy
+        report = {"total": 0, "imported": 0, "duplicates": 0, "errors": []}
+        workers = workers or 1
+        
+        def chunks():
+            chunk = []
+            for row_number, row, error in self.iter_import_rows(filename, file_format):
+                record = None if error else {field: str(row.get(field) or "").strip()
+                                             for field in self.IMPORT_FIELDS}
+                chunk.append((row_number, record, error))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        
+        def validated_chunks():
+            if workers <= 1:
+                for chunk in chunks():
+                    yield validate_customer_chunk(chunk)
+                return
+            # Không fork tiến trình đang có luồng (khóa đang giữ có thể bị sao chép ở trạng thái khóa)
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            with futures.ProcessPoolExecutor(max_workers=workers,
+                                             mp_context=multiprocessing.get_context(start_method)) as executor:
+                # Chỉ giữ một số lô đang xử lý để bộ nhớ không tăng theo kích thước file
+                in_flight = collections.deque()
+                for chunk in chunks():
+                    in_flight.append(executor.submit(validate_customer_chunk, chunk))
+                    if len(in_flight) >= workers * 2:
+                        yield in_flight.popleft().result()
+                while in_flight:
+                    yield in_flight.popleft().result()
+        
+        with self.lock:
+            # Chèn từng bản ghi vào thứ tự sắp xếp đã lưu quá tốn kém, để tính lại khi cần
+            self._sort_orders = {}
+        
+        for results in validated_chunks():
+            with self.exclusive():
+                batch = []
+                for row_number, record, error in results:
+                    report["total"] += 1
+                    if error:
+                        report["errors"].append((row_number, error))
+                        continue
+                    if self.check_duplicate_name(record["name"]):
+                        report["duplicates"] += 1
+                        continue
+                    
+                    if record["customer_type"] not in self.customer_types:
+                        record["customer_type"] = "Khách hàng thường"
+                    record["created_date"] = record["created_date"] or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    customer = Customer(id=self.next_id(), **record)
+                    self._append_customer(customer)
+                    batch.append((row_number, customer))
+                
+                if batch:
+                    if not self.storage.apply_many([customer for _, customer in batch], self._latest()):
+                        # Lô chưa được lưu: gỡ khỏi danh sách và chỉ mục để không hiện rồi mất khi tải lại
+                        for row_number, customer in reversed(batch):
+                            self._remove_customer(customer)
+                        report["errors"].extend((row_number, "Lỗi lưu dữ liệu") for row_number, _ in batch)
+                        report["errors"].append((None, "Lỗi lưu dữ liệu"))
+                        break
+                    report["imported"] += len(batch)
+        return report
+    
+    # Các trường lấy từ nguồn ngoài khi gộp; loại khách hàng là phân loại nội bộ nên chỉ đặt khi thêm mới
+    MERGE_FIELDS = ("name", "email", "phone", "address")
+    
+    @staticmethod
+    def merge_keys(record):
+        """Khóa tự nhiên để ghép bản ghi: email (chữ thường) và số điện thoại đã chuẩn hóa"""
+        email = (record.get("email") or "").strip().lower()
+        phone = (record.get("phone") or "").strip()
+        return email, CustomerValidator.normalize_phone(phone) or phone
+    
+    def merge_file(self, filename, file_format=None):
+        """Gộp dữ liệu từ file CSV/NDJSON; lỗi được báo theo số dòng trong file"""
+        rows = list(self.iter_import_rows(filename, file_format))
+        report = self.merge_customers([row for _, row, error in rows if not error],
+                                      [row_number for row_number, _, error in rows if not error])
+        read_errors = [(row_number, error) for row_number, _, error in rows if error]
+        if read_errors:
+            report["total"] += len(read_errors)
+            # Lỗi lưu dữ liệu (không có số dòng) vẫn đứng cuối
+            report["errors"] = sorted(read_errors + report["errors"],
+                                      key=lambda e: (e[0] is None, e[0] or 0))
+        return report
+    
+    @Metrics.timed()
+    def merge_customers(self, records, row_numbers=None):
+        """Gộp dữ liệu từ nguồn ngoài: thêm bản ghi mới, cập nhật bản ghi đã đổi, bỏ qua bản ghi giống hệt"""
+        # row_numbers: số dòng trong file của từng bản ghi, dùng khi báo lỗi (mặc định 1, 2, ...)
+        report = {"total": 0, "inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "errors": []}
+        fields = self.MERGE_FIELDS
+        records = [{field: str(record.get(field) or "").strip()
+                    for field in fields + ("customer_type", "created_date")} for record in records]
+        errors = CustomerValidator.validate_many(records)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        with self.exclusive():
+            # Chỉ mục băm dựng một lần cho dữ liệu hiện có: tổng chi phí O(n + m)
+            by_content = {}
+            by_email = {}
+            by_phone = {}
+            for customer in self._latest():
+                by_content[tuple(customer.get(field) for field in fields)] = customer
+                email, phone = self.merge_keys(customer)
+                by_email.setdefault(email, customer)
+                by_phone.setdefault(phone, customer)
+            
+            # Thứ tự sắp xếp đã lưu sẽ được tính lại khi cần thay vì chèn từng bản ghi
+            self._sort_orders = {}
+            changed = {}
+            
+            for index, record in enumerate(records):
+                report["total"] += 1
+                error = CustomerValidator.row_errors(errors, index)
+                if error:
+                    report["errors"].append((row_numbers[index] if row_numbers else index + 1, error))
+                    continue
                 
-                customer_types = ["Khách hàng thường", "Khách hàng VIP"]
+                content = tuple(record[field] for field in fields)
+                if content in by_content:
+                    report["unchanged"] += 1
+                    continue
                 
-                for user in users_data:
-                    customer = {
-                        "id": user["id"],
-                        "name": user["name"],
-                        "email": user["email"],
-                        "phone": user["phone"],
-                        "address": f"{user['address']['street']}, {user['address']['city']}",
-                        "customer_type": random.choice(customer_types),
-                        "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    customers.append(customer)
+                email, phone = self.merge_keys(record)
+                customer = by_email.get(email) or by_phone.get(phone)
+                if customer is not None:
+                    # Có thể đã được thay bằng bản mới ở dòng trước trong cùng lô
+                    customer = self.get_customer(customer["id"])
+                if self.check_duplicate_name(record["name"], exclude_id=customer["id"] if customer else None):
+                    report["duplicates"] += 1
+                    continue
                 
-                return customers
-            return []
-        except Exception as e:
-            print(f"Lỗi khi lấy dữ liệu từ API: {e}")
-            return []
+                if customer is None:
+                    if record["customer_type"] not in self.customer_types:
+                        record["customer_type"] = "Khách hàng thường"
+                    record["created_date"] = record["created_date"] or now
+                    customer = Customer(id=self.next_id(), **record)
+                    self._append_customer(customer)
+                    report["inserted"] += 1
+                else:
+                    old_content = tuple(customer.get(field) for field in fields)
+                    if by_content.get(old_content) is customer:
+                        del by_content[old_content]
+                    updated = customer.copy()
+                    for field in fields:
+                        updated[field] = record[field]
+                    updated["updated_date"] = now
+                    self._replace_customer(customer, updated)
+                    customer = updated
+                    if customer["id"] not in changed:
+                        report["updated"] += 1
+                
+                changed[customer["id"]] = customer
+                by_content[content] = customer
+                by_email.setdefault(email, customer)
+                by_phone.setdefault(phone, customer)
+            
+            # Ghi tất cả thay đổi trong một lần
+            if changed and not self.storage.apply_many(list(changed.values()), self._latest()):
+                report["errors"].append((None, "Lỗi lưu dữ liệu"))
+        return report
+    
+    def import_sample_data(self, mode="merge"):
+        """Import dữ liệu mẫu từ API: gộp vào dữ liệu hiện có (merge) hoặc thay thế toàn bộ (replace)"""
+        sample_customers = APIService.fetch_sample_customers()
+        if not sample_customers:
+            return None
+        if mode == "merge":
+            return self.merge_customers(sample_customers)
+        
+        with self.exclusive():
+            self.customers = [Customer.from_dict(c) for c in sample_customers]
+            self.rebuild_indexes()
+            saved = self.save_customers()
+        return {"total": len(sample_customers), "inserted": len(sample_customers) if saved else 0,
+                "updated": 0, "unchanged": 0, "duplicates": 0,
+                "errors": [] if saved else [(None, "Lỗi lưu dữ liệu")]}
 
-class CustomerManager:
-    """Class quản lý khách hàng"""
+class SQLiteCustomerManager(CustomerManager):
+    """Quản lý khách hàng trên SQLite: không nạp cả bảng, tìm kiếm/sắp xếp/kiểm tra trùng tên chạy bằng SQL"""
     
-    def __init__(self):
-        self.customers_file = "customers.json"
-        self.customers = self.load_customers()
+    def __init__(self, storage):
+        # Thay đổi của lần ghi đang diễn ra (đã hoặc sắp ghi xuống SQLite, chưa công bố):
+        # id -> khách hàng, None nếu đã xóa
+        self._pending = {}
+        self._pending_names = {}  # tên đã chuẩn hóa -> tập id trong _pending
         self.sort_column = None
         self.sort_reverse = False
-        # Định nghĩa các loại khách hàng
-        self.customer_types = ["Khách hàng thường", "Khách hàng VIP"]
+        super().__init__(storage)
     
     def load_customers(self):
-        """Tải danh sách khách hàng"""
-        return DataManager.load_json(self.customers_file)
+        """Danh sách ảo đọc từng đoạn từ SQLite theo thứ tự đang chọn"""
+        self.storage.mark_loaded()
+        return SQLiteCustomerList(self.storage, self.sort_column, self.sort_reverse)
     
     def save_customers(self):
-        """Lưu danh sách khách hàng"""
-        return DataManager.save_json(self.customers_file, self.customers)
+        """Ghi lại toàn bộ khách hàng (chỉ khi thay cả dữ liệu) rồi quay lại đọc từ SQLite"""
+        with self.exclusive():
+            customers = self._latest()
+            if isinstance(customers, SQLiteCustomerList):
+                return True
+            self.storage.save_meta({"last_id": self.last_id})
+            saved = self.storage.save_all(customers)
+            self.customers = self.load_customers()
+            self.rebuild_indexes()
+            return saved
+    
+    def rebuild_indexes(self):
+        """Không có chỉ mục trong bộ nhớ: bỏ các thay đổi tạm và đọc lại id lớn nhất"""
+        self._pending = {}
+        self._pending_names = {}
+        stored_last_id = self.storage.load_meta().get("last_id", 0)
+        self.last_id = max(self.last_id, stored_last_id, self.storage.max_id())
+    
+    def start_index_build(self):
+        """Không dùng chỉ mục trigram trong bộ nhớ: tìm kiếm chạy bằng SQL"""
+    
+    def publish(self):
+        """Công bố các thay đổi vừa ghi: danh sách ảo mới (đếm lại số dòng)"""
+        if self._pending:
+            self._pending = {}
+            self._pending_names = {}
+            self.customers = self.load_customers()
+    
+    def get_customer(self, customer_id):
+        """Lấy khách hàng theo id (khóa chính của bảng)"""
+        if customer_id in self._pending:
+            return self._pending[customer_id]
+        return self.storage.get(customer_id)
     
     def check_duplicate_name(self, name, exclude_id=None):
-        """Kiểm tra trùng tên khách hàng (không phân biệt hoa thường)"""
-        name_lower = name.lower().strip()
-        for customer in self.customers:
-            if customer["id"] != exclude_id and customer["name"].lower().strip() == name_lower:
-                return True
-        return False
+        """Kiểm tra trùng tên bằng chỉ mục name_key, tính cả các thay đổi chưa công bố"""
+        if any(cid != exclude_id for cid in self._pending_names.get(self.name_key(name), ())):
+            return True
+        return any(cid != exclude_id and cid not in self._pending for cid in self.storage.name_ids(name))
     
-    def add_customer(self, name, email, phone, address, customer_type="Khách hàng thường"):
-        """Thêm khách hàng mới"""
-        if self.check_duplicate_name(name):
-            return False, "Tên khách hàng đã tồn tại!"
-        
-        # Kiểm tra loại khách hàng hợp lệ
-        if customer_type not in self.customer_types:
-            customer_type = "Khách hàng thường"
-        
-        new_id = max([c["id"] for c in self.customers], default=0) + 1
-        new_customer = {
-            "id": new_id,
-            "name": name,
-            "email": email,
-            "phone": phone,
-            "address": address,
-            "customer_type": customer_type,
-            "created_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        self.customers.append(new_customer)
-        return self.save_customers(), "Thêm khách hàng thành công!"
+    def _stage(self, customer_id, customer):
+        """Ghi nhận thay đổi của lần ghi hiện tại"""
+        old = self._pending.get(customer_id)
+        if old is not None:
+            self._pending_names[self.name_key(old["name"])].discard(customer_id)
+        self._pending[customer_id] = customer
+        if customer is not None:
+            self._pending_names.setdefault(self.name_key(customer["name"]), set()).add(customer_id)
     
-    def update_customer(self, customer_id, name, email, phone, address, customer_type="Khách hàng thường"):
-        """Cập nhật thông tin khách hàng"""
-        if self.check_duplicate_name(name, exclude_id=customer_id):
-            return False, "Tên khách hàng đã tồn tại!"
-        
-        # Kiểm tra loại khách hàng hợp lệ
-        if customer_type not in self.customer_types:
-            customer_type = "Khách hàng thường"
-        
-        for customer in self.customers:
-            if customer["id"] == customer_id:
-                customer["name"] = name
-                customer["email"] = email
-                customer["phone"] = phone
-                customer["address"] = address
-                customer["customer_type"] = customer_type
-                customer["updated_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                return self.save_customers(), "Cập nhật khách hàng thành công!"
-        return False, "Không tìm thấy khách hàng!"
+    def _append_customer(self, customer):
+        """Thêm khách hàng (được ghi xuống SQLite ngay sau đó)"""
+        self._stage(customer["id"], customer)
     
-    def delete_customer(self, customer_id):
+    def _replace_customer(self, old, new):
+        """Thay bản ghi khách hàng"""
+        self._stage(new["id"], new)
+    
+    def _remove_customer(self, customer):
         """Xóa khách hàng"""
-        self.customers = [c for c in self.customers if c["id"] != customer_id]
-        return self.save_customers()
+        self._stage(customer["id"], None)
     
+    @Metrics.timed()
     def search_customers(self, keyword):
-        """Tìm kiếm khách hàng"""
-        keyword = keyword.lower()
-        results = []
-        for customer in self.customers:
-            if (keyword in customer["name"].lower() or 
-                keyword in customer["email"].lower() or 
-                keyword in customer["phone"].lower() or 
-                keyword in customer["address"].lower() or
-                keyword in customer.get("customer_type", "").lower()):
-                results.append(customer)
-        return results
+        """Tìm kiếm bằng SQL trên cột search_key, theo thứ tự đang hiển thị"""
+        return list(self.storage.search(keyword, self.sort_column, self.sort_reverse))
     
-    def sort_customers(self, column, reverse=False):
-        """Sắp xếp khách hàng theo cột"""
-        self.sort_column = column
-        self.sort_reverse = reverse
-        
-        if column == "name":
-            self.customers.sort(key=lambda x: x["name"].lower(), reverse=reverse)
-        elif column == "email":
-            self.customers.sort(key=lambda x: x["email"].lower(), reverse=reverse)
-        elif column == "phone":
-            self.customers.sort(key=lambda x: x["phone"], reverse=reverse)
-        elif column == "customer_type":
-            self.customers.sort(key=lambda x: x.get("customer_type", "").lower(), reverse=reverse)
-        elif column == "created_date":
-            self.customers.sort(key=lambda x: x.get("created_date", ""), reverse=reverse)
-        elif column == "id":
-            self.customers.sort(key=lambda x: x["id"], reverse=reverse)
-        
-        return self.customers
+    def explain_query(self, keyword):
+        """Kế hoạch thực hiện của SQLite cho truy vấn"""
+        return self.storage.explain(keyword)
     
-    def import_sample_data(self):
-        """Import dữ liệu mẫu từ API"""
-        sample_customers = APIService.fetch_sample_customers()
-        if sample_customers:
-            self.customers = sample_customers
-            return self.save_customers()
-        return False
+    @Metrics.timed()
+    def sort_customers(self, column, reverse=False, keyword=None):
+        """Sắp xếp bằng ORDER BY trên chỉ mục; danh sách hiển thị chỉ đổi thứ tự đọc, không nạp dữ liệu"""
+        if column not in self.SORT_KEYS:
+            return self.search_customers(keyword) if keyword else self.customers
+        customers = SQLiteCustomerList(self.storage, column, reverse)
+        if self.lock.acquire(timeout=self.LOCK_WAIT):
+            try:
+                self.sort_column = column
+                self.sort_reverse = reverse
+                self.customers = customers
+            finally:
+                self.lock.release()
+        if keyword:
+            return list(self.storage.search(keyword, column, reverse))
+        return customers
+
+class BackgroundLoader:
+    """Chạy một hàm tải dữ liệu trên luồng nền ngay từ đầu, lấy kết quả khi cần"""
+    
+    def __init__(self, load, name="loader"):
+        self.load = load
+        self.name = name
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    def start(self):
+        """Bắt đầu tải"""
+        self.thread.start()
+        return self
+    
+    def run(self):
+        """Thân luồng tải"""
+        try:
+            self.result = self.load()
+        except Exception as e:
+            self.error = e
+            print(f"Lỗi tải dữ liệu ({self.name}): {e}")
+        finally:
+            StartupReport.mark(f"{self.name}_ready")
+            self.done.set()
+    
+    def ready(self):
+        """Đã tải xong (thành công hoặc lỗi)"""
+        return self.done.is_set()
+    
+    def get(self, timeout=None):
+        """Chờ và trả về kết quả; ném lại lỗi nếu tải thất bại"""
+        self.done.wait(timeout)
+        if self.error:
+            raise self.error
+        return self.result
+
+class TkTaskQueue:
+    """Hàng đợi chuyển kết quả từ luồng nền về luồng giao diện Tk"""
+    
+    def __init__(self, window, interval=30):
+        self.window = window
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.busy = False
+        self.window.after(self.interval, self.process)
+    
+    def post(self, callback, *args):
+        """Gửi một hàm để chạy trên luồng giao diện (gọi được từ mọi luồng)"""
+        self.queue.put((callback, args))
+    
+    def run_in_background(self, work, on_done=None, on_error=None):
+        """Chạy work trên luồng nền rồi gọi on_done/on_error trên luồng giao diện"""
+        def runner():
+            try:
+                result = work()
+            except Exception as e:
+                if on_error:
+                    self.post(on_error, e)
+                else:
+                    print(f"Lỗi tác vụ nền: {e}")
+            else:
+                if on_done:
+                    self.post(on_done, result)
+        
+        threading.Thread(target=runner, daemon=True).start()
+    
+    def run_exclusive(self, work, on_done=None, on_error=None):
+        """Như run_in_background nhưng hiện con trỏ chờ và bỏ qua yêu cầu mới khi tác vụ trước chưa xong"""
+        if self.busy:
+            return False
+        self.busy = True
+        self.window.config(cursor="watch")
+        
+        def finish(callback, value):
+            self.busy = False
+            self.window.config(cursor="")
+            if callback:
+                callback(value)
+            elif isinstance(value, Exception):
+                print(f"Lỗi tác vụ nền: {value}")
+        
+        self.run_in_background(work, lambda result: finish(on_done, result),
+                               lambda error: finish(on_error, error))
+        return True
+    
+    def process(self):
+        """Chạy các hàm đang chờ rồi hẹn lần kiểm tra tiếp theo"""
+        try:
+            while True:
+                callback, args = self.queue.get_nowait()
+                callback(*args)
+        except queue.Empty:
+            pass
+        
+        try:
+            self.window.after(self.interval, self.process)
+        except tk.TclError:
+            # Cửa sổ đã bị đóng
+            pass
+
+class SearchScheduler:
+    """Trì hoãn tìm kiếm khi đang gõ và chạy truy vấn trên luồng nền"""
+    
+    def __init__(self, window, tasks, search, on_results, delay=200):
+        self.window = window
+        self.tasks = tasks
+        self.search = search            # hàm tìm kiếm, chạy trên luồng nền
+        self.on_results = on_results    # hàm nhận kết quả, chạy trên luồng giao diện
+        self.delay = delay
+        self.generation = 0             # tăng mỗi lần có truy vấn mới, để bỏ kết quả cũ
+        self.after_id = None
+    
+    def schedule(self, keyword):
+        """Hẹn tìm kiếm sau delay ms; lần gõ phím mới sẽ hủy lần hẹn trước"""
+        self.cancel()
+        generation = self.generation
+        self.after_id = self.window.after(self.delay, lambda: self.start(keyword, generation))
+    
+    def cancel(self):
+        """Hủy truy vấn đang hẹn và bỏ qua kết quả của truy vấn đang chạy"""
+        self.generation += 1
+        if self.after_id is not None:
+            self.window.after_cancel(self.after_id)
+            self.after_id = None
+    
+    def start(self, keyword, generation):
+        """Bắt đầu chạy truy vấn trên luồng nền"""
+        self.after_id = None
+        if generation != self.generation:
+            return
+        self.tasks.run_in_background(lambda: self.search(keyword),
+                                     lambda results: self.deliver(generation, results))
+    
+    def deliver(self, generation, results):
+        """Hiển thị kết quả nếu vẫn là truy vấn mới nhất"""
+        if generation == self.generation:
+            self.on_results(results)
+
+class VirtualTreeview:
+    """Bảng Treeview ảo: chỉ tạo các dòng nằm trong vùng nhìn thấy"""
+    
+    def __init__(self, parent, columns, row_values, buffer_rows=5, **kwargs):
+        self.rows = []
+        self.offset = 0
+        self.row_values = row_values    # hàm chuyển bản ghi -> tuple giá trị của dòng
+        self.buffer_rows = buffer_rows
+        self.selected_key = None        # giá trị cột đầu (id) của dòng đang chọn
+        
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", **kwargs)
+        self.v_scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scrollbar)
+        
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        self.row_height = int(row_height) if row_height else 20
+        
+        self.tree.bind("<Configure>", lambda event: self.render())
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.visible_count()))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.visible_count()))
+    
+    def visible_count(self):
+        """Số dòng vừa với chiều cao hiện tại của bảng"""
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Chưa được vẽ lên màn hình: dùng chiều cao khai báo
+            return int(self.tree.cget("height"))
+        # Trừ phần tiêu đề cột
+        return max(1, (height - self.row_height) // self.row_height)
+    
+    def set_rows(self, rows):
+        """Đặt danh sách bản ghi cần hiển thị"""
+        self.rows = rows
+        self.offset = 0
+        self.render()
+    
+    def max_offset(self):
+        """Vị trí bắt đầu lớn nhất vẫn lấp đầy vùng nhìn thấy"""
+        return max(0, len(self.rows) - self.visible_count())
+    
+    def scroll_to(self, offset):
+        """Cuộn tới dòng bắt đầu offset"""
+        offset = min(max(0, int(offset)), self.max_offset())
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+    
+    def scroll(self, delta):
+        """Cuộn theo số dòng"""
+        self.scroll_to(self.offset + delta)
+        return "break"
+    
+    def render(self):
+        """Đổ dữ liệu của cửa sổ dòng hiện tại vào các item có sẵn của Treeview"""
+        self.offset = min(self.offset, self.max_offset())
+        window = self.rows[self.offset:self.offset + self.visible_count() + self.buffer_rows]
+        items = self.tree.get_children()
+        
+        # Tái sử dụng item cũ thay vì xóa rồi tạo lại
+        selected_item = None
+        for i, row in enumerate(window):
+            values = self.row_values(row)
+            if i < len(items):
+                item = items[i]
+                self.tree.item(item, values=values)
+            else:
+                item = self.tree.insert("", tk.END, values=values)
+            if values[0] == self.selected_key:
+                selected_item = item
+        if len(items) > len(window):
+            self.tree.delete(*items[len(window):])
+        
+        if selected_item is not None:
+            self.tree.selection_set(selected_item)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        
+        self.update_scrollbar()
+    
+    def update_scrollbar(self):
+        """Cập nhật thanh cuộn theo vị trí trong toàn bộ danh sách"""
+        total = len(self.rows)
+        if total == 0:
+            self.v_scrollbar.set(0, 1)
+            return
+        first = self.offset / total
+        last = min(1.0, (self.offset + self.visible_count()) / total)
+        self.v_scrollbar.set(first, last)
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        """Xử lý thao tác trên thanh cuộn"""
+        if action == "moveto":
+            self.scroll_to(float(amount) * len(self.rows))
+        elif action == "scroll":
+            step = self.visible_count() if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+    
+    def on_mousewheel(self, event):
+        """Cuộn bằng con lăn chuột"""
+        return self.scroll(-3 if event.delta > 0 else 3)
+    
+    def on_select(self, event=None):
+        """Ghi nhớ dòng đang chọn để giữ lựa chọn khi cuộn"""
+        selection = self.tree.selection()
+        if selection:
+            values = self.tree.item(selection[0])["values"]
+            self.selected_key = values[0] if values else None
+    
+    def move_selection(self, delta):
+        """Di chuyển dòng chọn bằng phím mũi tên, cuộn khi chạm mép"""
+        items = self.tree.get_children()
+        if not items:
+            return "break"
+        selection = self.tree.selection()
+        index = items.index(selection[0]) + delta if selection else 0
+        if index < 0:
+            self.scroll(-1)
+            index = 0
+        elif index >= min(len(items), self.visible_count()):
+            self.scroll(1)
+            index = min(len(self.tree.get_children()), self.visible_count()) - 1
+        items = self.tree.get_children()
+        self.tree.selection_set(items[index])
+        self.tree.focus(items[index])
+        return "break"
 
 class ChangePasswordWindow:
     """Cửa sổ đổi mật khẩu với giao diện được cải thiện"""
@@ -342,6 +3939,7 @@ class ChangePasswordWindow:
         self.window.transient(parent_window)
         self.window.grab_set()
         
+        self.tasks = TkTaskQueue(self.window)
         self.create_widgets()
     
     def center_window(self):
@@ -484,22 +4082,28 @@ class ChangePasswordWindow:
             self.new_password_entry.focus()
             return
         
-        # Attempt to change password
-        success, message = self.user_manager.change_password(current_password, new_password)
-        
-        if success:
-            messagebox.showinfo("Thành công", 
-                              f"{message}\n\nMật khẩu của bạn đã được cập nhật thành công!\nVui lòng ghi nhớ mật khẩu mới.")
-            self.window.destroy()
-        else:
-            messagebox.showerror("Lỗi", message)
-            if "hiện tại không đúng" in message:
-                self.current_password_entry.delete(0, tk.END)
-                self.current_password_entry.focus()
-            elif "ít nhất 6 ký tự" in message:
-                self.new_password_entry.delete(0, tk.END)
-                self.confirm_password_entry.delete(0, tk.END)
-                self.new_password_entry.focus()
+        # Attempt to change password (băm mật khẩu trên luồng nền)
+        def on_done(result):
+            success, message = result
+            if success:
+                messagebox.showinfo("Thành công", 
+                                  f"{message}\n\nMật khẩu của bạn đã được cập nhật thành công!\nVui lòng ghi nhớ mật khẩu mới.")
+                self.window.destroy()
+            else:
+                messagebox.showerror("Lỗi", message)
+                if "hiện tại không đúng" in message:
+                    self.current_password_entry.delete(0, tk.END)
+                    self.current_password_entry.focus()
+                elif "ít nhất 6 ký tự" in message:
+                    self.new_password_entry.delete(0, tk.END)
+                    self.confirm_password_entry.delete(0, tk.END)
+                    self.new_password_entry.focus()
+        
+        def on_error(error):
+            messagebox.showerror("Lỗi", f"Không thể đổi mật khẩu: {error}")
+        
+        self.tasks.run_exclusive(lambda: self.user_manager.change_password(current_password, new_password),
+                                 on_done, on_error)
 
 class ForgotPasswordWindow:
     """Cửa sổ quên mật khẩu - Đã sửa để có thể cuộn"""
@@ -517,6 +4121,7 @@ class ForgotPasswordWindow:
         self.window.transient(parent_window)
         self.window.grab_set()
         
+        self.tasks = TkTaskQueue(self.window)
         self.create_widgets()
     
     def center_window(self):
@@ -636,14 +4241,21 @@ class ForgotPasswordWindow:
             messagebox.showerror("Lỗi", "Vui lòng nhập câu trả lời!")
             return
         
-        success, result = self.user_manager.reset_password(username, answer)
-        if success:
-            messagebox.showinfo("Thành công", 
-                               f"Mật khẩu mới của bạn là: {result}\n\n"
-                               "Vui lòng ghi nhớ và đổi mật khẩu sau khi đăng nhập!")
-            self.window.destroy()
-        else:
-            messagebox.showerror("Lỗi", "Câu trả lời không chính xác!")
+        def on_done(outcome):
+            success, result = outcome
+            if success:
+                messagebox.showinfo("Thành công", 
+                                   f"Mật khẩu mới của bạn là: {result}\n\n"
+                                   "Vui lòng ghi nhớ và đổi mật khẩu sau khi đăng nhập!")
+                self.window.destroy()
+            else:
+                messagebox.showerror("Lỗi", "Câu trả lời không chính xác!")
+        
+        def on_error(error):
+            messagebox.showerror("Lỗi", f"Không thể đặt lại mật khẩu: {error}")
+        
+        self.tasks.run_exclusive(lambda: self.user_manager.reset_password(username, answer),
+                                 on_done, on_error)
 
 class RegisterWindow:
     """Cửa sổ đăng ký"""
@@ -660,6 +4272,7 @@ class RegisterWindow:
         self.window.transient(parent_window)
         self.window.grab_set()
         
+        self.tasks = TkTaskQueue(self.window)
         self.create_widgets()
     
     def center_window(self):
@@ -766,13 +4379,20 @@ class RegisterWindow:
             messagebox.showerror("Lỗi", "Email không hợp lệ!")
             return
         
-        success, message = self.user_manager.register(username, password, email, 
-                                                     security_question, security_answer)
-        if success:
-            messagebox.showinfo("Thành công", message)
-            self.window.destroy()
-        else:
-            messagebox.showerror("Lỗi", message)
+        def on_done(result):
+            success, message = result
+            if success:
+                messagebox.showinfo("Thành công", message)
+                self.window.destroy()
+            else:
+                messagebox.showerror("Lỗi", message)
+        
+        def on_error(error):
+            messagebox.showerror("Lỗi", f"Không thể đăng ký: {error}")
+        
+        self.tasks.run_exclusive(lambda: self.user_manager.register(username, password, email,
+                                                                    security_question, security_answer),
+                                 on_done, on_error)
 
 class LoginWindow:
     """Cửa sổ đăng nhập"""
@@ -785,6 +4405,7 @@ class LoginWindow:
         self.window.geometry("450x400")
         self.window.resizable(False, False)
         self.window.configure(bg="#f0f4f8")
+        self.tasks = TkTaskQueue(self.window)
         
         self.center_window()
         self.create_widgets()
@@ -847,12 +4468,19 @@ class LoginWindow:
             messagebox.showerror("Lỗi", "Vui lòng nhập đầy đủ thông tin!")
             return
         
-        if self.user_manager.login(username, password):
-            self.window.destroy()
-            self.on_login_success()
-        else:
-            messagebox.showerror("Lỗi", "Tên đăng nhập hoặc mật khẩu không đúng!")
-            self.password_entry.delete(0, tk.END)
+        def on_done(success):
+            if success:
+                self.window.destroy()
+                self.on_login_success()
+            else:
+                messagebox.showerror("Lỗi", "Tên đăng nhập hoặc mật khẩu không đúng!")
+                self.password_entry.delete(0, tk.END)
+        
+        def on_error(error):
+            messagebox.showerror("Lỗi", f"Không thể đăng nhập: {error}")
+        
+        # Kiểm tra mật khẩu (KDF chậm) trên luồng nền để giao diện không bị treo
+        self.tasks.run_exclusive(lambda: self.user_manager.login(username, password), on_done, on_error)
     
     def register(self):
         """Mở cửa sổ đăng ký"""
@@ -866,22 +4494,331 @@ class LoginWindow:
         """Chạy cửa sổ đăng nhập"""
         self.window.mainloop()
 
+def create_storages(backend=None, saver=None):
+    """Tạo storage (người dùng, khách hàng) theo backend: json (mặc định), ndjson hoặc sqlite"""
+    backend = backend or os.environ.get("CRM_STORAGE", "json")
+    if backend == "sqlite":
+        if not os.path.exists("crm.db") and (os.path.exists("customers.json") or os.path.exists("users.json")):
+            # Lần đầu dùng SQLite: chuyển dữ liệu JSON sẵn có (giống nhánh ndjson chuyển customers.json)
+            success, message = DataManager.migrate_json_to_sqlite("crm.db")
+            if not success:
+                print(message)
+                # Bỏ CSDL dở dang để lần sau chuyển lại
+                for path in ("crm.db", "crm.db-wal", "crm.db-shm"):
+                    if os.path.exists(path):
+                        os.remove(path)
+        return SQLiteUserStorage(), SQLiteCustomerStorage()
+    
+    user_storage = JsonStorage("users.json", ChangeJournal("users.journal"), saver)
+    if backend == "ndjson":
+        if not os.path.exists("customers.ndjson") and os.path.exists("customers.json"):
+            DataManager.convert_json_to_ndjson("customers.json", "customers.ndjson")
+        return user_storage, NdjsonStorage("customers.ndjson", ChangeJournal("customers.journal"), saver)
+    return user_storage, JsonStorage("customers.json", ChangeJournal("customers.journal"), saver)
+
+def create_customer_manager(storage):
+    """Tạo lớp quản lý khách hàng phù hợp với storage: SQLite truy vấn thẳng CSDL thay vì nạp cả bảng"""
+    if isinstance(storage, SQLiteCustomerStorage):
+        return SQLiteCustomerManager(storage)
+    return CustomerManager(storage)
+
+class CommandLine:
+    """Giao diện dòng lệnh không cần Tk: mỗi kết quả là một dòng JSON trên stdout"""
+    
+    @staticmethod
+    def build_parser():
+        """Khai báo các lệnh"""
+        parser = argparse.ArgumentParser(prog="python -m Nhóm_19_Bảo_Phúc",
+                                         description="Hệ thống quản lý khách hàng (chế độ dòng lệnh)")
+        parser.add_argument("--storage", choices=["json", "ndjson", "sqlite"],
+                            help="nơi lưu trữ (mặc định: biến môi trường CRM_STORAGE hoặc json)")
+        parser.add_argument("--metrics", action="store_true",
+                            help="đo thời gian các thao tác, in số liệu (dòng JSON) ra stderr khi kết thúc")
+        commands = parser.add_subparsers(dest="command", required=True)
+        
+        customers = commands.add_parser("customers", help="thao tác với khách hàng")
+        actions = customers.add_subparsers(dest="action", required=True)
+        
+        add = actions.add_parser("add", help="thêm khách hàng")
+        add.add_argument("--name", required=True)
+        add.add_argument("--email", required=True)
+        add.add_argument("--phone", required=True)
+        add.add_argument("--address", default="")
+        add.add_argument("--type", dest="customer_type", default="Khách hàng thường")
+        
+        search = actions.add_parser("search", help="tìm kiếm khách hàng")
+        search.add_argument("keyword", help='từ khóa hoặc truy vấn, vd: \'type:VIP created:2025-01..2025-06 name:"trần"\'')
+        search.add_argument("--limit", type=int)
+        search.add_argument("--explain", action="store_true", help="chỉ in kế hoạch thực hiện truy vấn")
+        
+        sort = actions.add_parser("sort", help="liệt kê khách hàng theo thứ tự một cột")
+        sort.add_argument("column", choices=sorted(CustomerManager.SORT_KEYS))
+        sort.add_argument("--reverse", action="store_true")
+        sort.add_argument("--keyword")
+        sort.add_argument("--limit", type=int)
+        
+        export = actions.add_parser("export", help="xuất toàn bộ khách hàng")
+        export.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+        export.add_argument("--output", help="file đích (mặc định: stdout)")
+        
+        import_ = actions.add_parser("import", help="import khách hàng từ file CSV/NDJSON")
+        import_.add_argument("file")
+        import_.add_argument("--format", choices=["csv", "ndjson"])
+        import_.add_argument("--merge", action="store_true",
+                             help="gộp theo email/số điện thoại thay vì chỉ thêm mới")
+        import_.add_argument("--workers", type=int, default=1,
+                             help="số process kiểm tra dữ liệu song song (mặc định: 1, kiểm tra trong tiến trình)")
+        
+        actions.add_parser("stats", help="thống kê dữ liệu")
+        actions.add_parser("compact", help="nén nhật ký thay đổi vào snapshot")
+        
+        bench_memory = commands.add_parser("bench-memory", help="so sánh bộ nhớ dict và Customer")
+        bench_memory.add_argument("count", nargs="?", type=int, default=100000)
+        bench_api = commands.add_parser("bench-api", help="đo tốc độ tải API với máy chủ giả lập")
+        bench_api.add_argument("count", nargs="?", type=int, default=100000)
+        bench_kdf = commands.add_parser("bench-kdf", help="hiệu chỉnh chi phí băm mật khẩu")
+        bench_kdf.add_argument("target_ms", nargs="?", type=float, default=250)
+        bench_startup = commands.add_parser("bench-startup",
+                                            help="đo khởi động lạnh, mã thoát 1 nếu vượt ngân sách")
+        bench_startup.add_argument("--runs", type=int, default=5)
+        bench_startup.add_argument("--budget-ms", type=float,
+                                   help="ngân sách (mặc định: CRM_STARTUP_BUDGET_MS hoặc 300)")
+        commands.add_parser("startup-probe", help="(nội bộ) chạy các bước khởi động rồi thoát")
+        
+        migrate = commands.add_parser("migrate", help="chuyển dữ liệu JSON (kèm nhật ký) sang SQLite")
+        migrate.add_argument("--db", default="crm.db", help="file CSDL đích (mặc định: crm.db)")
+        
+        generate = commands.add_parser("generate", help="sinh dữ liệu khách hàng giả lập")
+        generate.add_argument("count", type=int)
+        generate.add_argument("--output", required=True, help="file .json hoặc .ndjson")
+        generate.add_argument("--seed", type=int, default=19)
+        
+        bench_suite = commands.add_parser("bench-suite", help="đo các thao tác chính theo kích thước dữ liệu")
+        bench_suite.add_argument("--sizes", default="10000,100000", help="các kích thước, cách nhau bởi dấu phẩy")
+        bench_suite.add_argument("--seed", type=int, default=19)
+        bench_suite.add_argument("--output", help="file JSON lưu kết quả")
+        bench_suite.add_argument("--baseline", help="file kết quả cũ để so sánh")
+        return parser
+    
+    @staticmethod
+    def emit(record, out=None):
+        """Ghi một dòng JSON"""
+        out = out or sys.stdout
+        out.write(json.dumps(record, ensure_ascii=False, default=DataManager.json_default) + "\n")
+    
+    @staticmethod
+    def emit_all(records, limit=None):
+        """Ghi lần lượt từng bản ghi, dừng sau limit bản ghi"""
+        for count, record in enumerate(records):
+            if limit is not None and count >= limit:
+                break
+            CommandLine.emit(record)
+    
+    @staticmethod
+    def run(argv):
+        """Chạy một lệnh, trả về mã thoát"""
+        args = CommandLine.build_parser().parse_args(argv)
+        if args.metrics:
+            Metrics.enabled = True
+        try:
+            if args.command == "bench-memory":
+                CommandLine.emit(Benchmark.customer_memory(args.count))
+            elif args.command == "bench-api":
+                CommandLine.emit(Benchmark.api_throughput(args.count))
+            elif args.command == "bench-kdf":
+                CommandLine.emit(Benchmark.kdf_calibration(args.target_ms))
+            elif args.command == "bench-startup":
+                report = Benchmark.cold_start(args.runs, args.budget_ms)
+                CommandLine.emit(report)
+                return 0 if report["within_budget"] else 1
+            elif args.command == "generate":
+                start = time.perf_counter()
+                count = SyntheticData.write(args.output, args.count, args.seed)
+                CommandLine.emit({"output": args.output, "customers": count,
+                                  "seconds": round(time.perf_counter() - start, 2)})
+            elif args.command == "bench-suite":
+                sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+                report = Benchmark.run_suite(sizes, args.seed, args.output)
+                CommandLine.emit_all(report["results"])
+                if args.baseline:
+                    baseline = DataManager.load_json(args.baseline)
+                    CommandLine.emit_all({"comparison": item}
+                                         for item in Benchmark.compare_suites(baseline, report))
+            elif args.command == "migrate":
+                success, message = DataManager.migrate_json_to_sqlite(args.db)
+                CommandLine.emit({"ok": success, "message": message})
+                return 0 if success else 1
+            elif args.command == "startup-probe":
+                # Các bước trước khi hiện cửa sổ đăng nhập (không tạo cửa sổ)
+                CustomerManagementApp(args.storage)
+                _import_tk()
+                StartupReport.mark("ready")
+                CommandLine.emit(StartupReport.as_dict())
+            else:
+                return CommandLine.run_customers(args)
+            return 0
+        except BrokenPipeError:
+            # Đầu ra bị đóng sớm (vd: | head)
+            sys.stderr.close()
+            return 0
+        finally:
+            if args.metrics and not sys.stderr.closed:
+                CommandLine.emit({"metrics": Metrics.snapshot()}, sys.stderr)
+    
+    @staticmethod
+    def run_customers(args):
+        """Các lệnh customers"""
+        saver = BackgroundSaver()
+        user_storage, storage = create_storages(args.storage, saver)
+        try:
+            if args.action == "export":
+                return CommandLine.export(storage, args.format, args.output)
+            if args.action == "stats":
+                return CommandLine.stats(storage, user_storage)
+            if args.action == "sort" or (args.action == "search" and not args.explain):
+                return CommandLine.query(storage, args)
+            
+            manager = create_customer_manager(storage)
+            if args.action == "add":
+                record = {"name": args.name.strip(), "email": args.email.strip(),
+                          "phone": args.phone.strip(), "address": args.address.strip()}
+                error = CustomerValidator.validate_record(record)
+                if error:
+                    CommandLine.emit({"ok": False, "message": error})
+                    return 1
+                success, message = manager.add_customer(customer_type=args.customer_type, **record)
+                CommandLine.emit({"ok": success, "message": message, "id": manager.last_id if success else None})
+                return 0 if success else 1
+            if args.action == "search":
+                CommandLine.emit({"plan": manager.explain_query(args.keyword)})
+            elif args.action == "import":
+                if args.merge:
+                    report = manager.merge_file(args.file, args.format)
+                else:
+                    report = manager.bulk_import(args.file, args.format, workers=args.workers)
+                CommandLine.emit(report)
+                return 1 if report["errors"] and report["errors"][-1][0] is None else 0
+            elif args.action == "compact":
+                success = manager.compact()
+                CommandLine.emit({"ok": success, "customers": len(manager.customers)})
+                return 0 if success else 1
+            return 0
+        finally:
+            # Chờ các lần ghi nền (nén nhật ký) hoàn tất trước khi thoát
+            saver.flush()
+            storage.close()
+            user_storage.close()
+    
+    @staticmethod
+    def export(storage, file_format, output=None):
+        """Xuất khách hàng theo luồng, không dựng CustomerManager"""
+        out = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+        try:
+            records = storage.iter_records()
+            if file_format == "csv":
+                writer = csv.DictWriter(out, fieldnames=Customer.FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                for record in records:
+                    CommandLine.emit(record, out)
+        finally:
+            if output:
+                out.close()
+        return 0
+    
+    @staticmethod
+    def query(storage, args):
+        """Tìm kiếm/sắp xếp một lần theo luồng qua các bản ghi, không dựng CustomerManager và chỉ mục"""
+        column = args.column if args.action == "sort" else None
+        reverse = column is not None and args.reverse
+        keyword = args.keyword or ""
+        if isinstance(storage, SQLiteCustomerStorage):
+            CommandLine.emit_all(storage.search(keyword, column, reverse, args.limit))
+            return 0
+        
+        records = storage.iter_records()
+        if keyword:
+            match = CustomerManager.matcher(keyword)
+            records = (record for record in records if match(record))
+        if column is not None:
+            key = CustomerManager.SORT_KEYS[column]
+            order = lambda record: (key(record), record["id"])
+            if args.limit is None:
+                records = sorted(records, key=order, reverse=reverse)
+            else:
+                # Chỉ giữ limit bản ghi đứng đầu thay vì sắp xếp cả danh sách
+                records = (heapq.nlargest if reverse else heapq.nsmallest)(args.limit, records, key=order)
+        CommandLine.emit_all(records, args.limit)
+        return 0
+    
+    @staticmethod
+    def stats(storage, user_storage):
+        """Thống kê theo luồng qua các bản ghi"""
+        total = 0
+        by_type = collections.Counter()
+        first_date = last_date = None
+        for record in storage.iter_records():
+            total += 1
+            by_type[record.get("customer_type", "")] += 1
+            created = record.get("created_date")
+            if created:
+                first_date = min(first_date or created, created)
+                last_date = max(last_date or created, created)
+        CommandLine.emit({
+            "customers": total,
+            "by_type": dict(by_type),
+            "first_created": first_date,
+            "last_created": last_date,
+            "last_id": storage.load_meta().get("last_id"),
+            "users": sum(1 for _ in user_storage.iter_records())
+        })
+        return 0
+
 class CustomerManagementApp:
     """Ứng dụng chính quản lý khách hàng"""
     
-    def __init__(self):
-        self.user_manager = UserManager()
-        self.customer_manager = CustomerManager()
+    # Chu kỳ kiểm tra thay đổi từ máy khác dùng chung file dữ liệu
+    POLL_INTERVAL_MS = int(os.environ.get("CRM_POLL_MS", "2000"))
+    
+    def __init__(self, backend=None):
+        # Luồng ghi nền: giao diện không phải chờ ghi file
+        self.saver = BackgroundSaver()
+        # Chọn nơi lưu trữ: "json" (mặc định), "ndjson" hoặc "sqlite"
+        user_storage, self.customer_storage = create_storages(backend, self.saver)
+        StartupReport.mark("storages")
+        self.user_manager = UserManager(user_storage)
+        StartupReport.mark("users")
+        # Tải khách hàng trên luồng nền trong lúc người dùng nhập thông tin đăng nhập
+        self.customer_manager = None
+        self.customer_loader = BackgroundLoader(self.load_customer_manager, "customers").start()
+        self.startup_reported = False
         self.window = None
         self.tree = None
         self.search_var = None
         self.sort_var = None
-        
+        self.polling = False
+    
+    def load_customer_manager(self):
+        """Tải khách hàng (trên luồng nền) rồi dựng chỉ mục tìm kiếm ở luồng riêng, không chặn giao diện"""
+        manager = create_customer_manager(self.customer_storage)
+        manager.start_index_build()
+        return manager
+    
     def start(self):
         """Khởi động ứng dụng"""
+        _import_tk()
         login_window = LoginWindow(self.user_manager, self.show_main_window)
+        if not self.startup_reported:
+            self.startup_reported = True
+            login_window.window.after_idle(self.report_startup)
         login_window.run()
     
+    def report_startup(self):
+        """Ghi mốc cửa sổ đăng nhập đã hiện và in báo cáo khởi động nếu được bật"""
+        StartupReport.mark("login_window")
+        StartupReport.print_if_enabled()
+    
     def show_main_window(self):
         """Hiển thị cửa sổ chính"""
         self.window = tk.Tk()
@@ -889,12 +4826,51 @@ class CustomerManagementApp:
         self.window.geometry("1300x750")
         
         self.center_window()
-        self.create_main_interface()
-        self.load_customer_data()
+        self.tasks = TkTaskQueue(self.window)
+        if self.customer_manager is None and not self.customer_loader.ready():
+            self.show_loading_indicator()
+        else:
+            self.build_main_window()
         
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.window.mainloop()
     
+    def show_loading_indicator(self):
+        """Hiện thanh chờ cho tới khi luồng nền tải xong dữ liệu khách hàng"""
+        frame = ttk.Frame(self.window, padding=40)
+        frame.pack(expand=True)
+        ttk.Label(frame, text="Đang tải dữ liệu khách hàng...", font=("Arial", 12)).pack(pady=10)
+        progress = ttk.Progressbar(frame, mode="indeterminate", length=300)
+        progress.pack()
+        progress.start(15)
+        
+        def poll():
+            if self.customer_loader.ready():
+                progress.stop()
+                frame.destroy()
+                self.build_main_window()
+            else:
+                self.window.after(50, poll)
+        
+        self.window.after(50, poll)
+    
+    def build_main_window(self):
+        """Dựng giao diện chính khi đã có dữ liệu khách hàng"""
+        if self.customer_manager is None:
+            try:
+                self.customer_manager = self.customer_loader.get()
+            except Exception as e:
+                messagebox.showerror("Lỗi", f"Không thể tải dữ liệu khách hàng: {e}")
+                self.window.destroy()
+                return
+        self.search_scheduler = SearchScheduler(self.window, self.tasks,
+                                                self.customer_manager.search_customers,
+                                                self.load_customer_data)
+        self.create_main_interface()
+        self.load_customer_data()
+        self.polling = False
+        self.window.after(self.POLL_INTERVAL_MS, self.poll_external_changes)
+    
     def center_window(self):
         """Căn giữa cửa sổ"""
         self.window.update_idletasks()
@@ -928,6 +4904,7 @@ class CustomerManagementApp:
         search_entry = tk.Entry(first_row, textvariable=self.search_var, font=("Arial", 10), width=30)
         search_entry.pack(side=tk.LEFT, padx=5)
         search_entry.bind('<KeyRelease>', self.on_search)
+        tk.Button(first_row, text="?", command=self.show_search_help, width=2).pack(side=tk.LEFT)
         
         tk.Label(first_row, text="Sắp xếp theo:", bg="lightgray", font=("Arial", 10)).pack(side=tk.LEFT, padx=(20, 5))
         self.sort_var = tk.StringVar()
@@ -952,6 +4929,8 @@ class CustomerManagementApp:
         
         self.stats_label = tk.Label(first_row, text="", bg="lightgray", font=("Arial", 10), fg="blue")
         self.stats_label.pack(side=tk.RIGHT, padx=20)
+        tk.Button(first_row, text="Hiệu năng", command=self.show_metrics_panel,
+                  font=("Arial", 9)).pack(side=tk.RIGHT)
         
         second_row = tk.Frame(toolbar_frame, bg="lightgray")
         second_row.pack(fill=tk.X, pady=5)
@@ -981,6 +4960,8 @@ class CustomerManagementApp:
         if self.user_manager.is_admin():
             tk.Button(btn_frame, text="Import API", command=self.import_sample_data, 
                      bg="blue", fg="white", font=("Arial", 10)).pack(side=tk.LEFT, padx=2)
+            tk.Button(btn_frame, text="Import file", command=self.import_file, 
+                     bg="blue", fg="white", font=("Arial", 10)).pack(side=tk.LEFT, padx=2)
         
         tk.Button(btn_frame, text="Làm mới", command=self.refresh_data, 
                  bg="gray", fg="white", font=("Arial", 10)).pack(side=tk.LEFT, padx=2)
@@ -1000,7 +4981,9 @@ class CustomerManagementApp:
         tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
         columns = ("ID", "Tên", "Email", "Điện thoại", "Địa chỉ", "Loại KH", "Ngày tạo")
-        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=20)
+        # Bảng ảo: chỉ tạo các dòng đang hiển thị, dữ liệu được đổ vào khi cuộn
+        self.grid = VirtualTreeview(tree_frame, columns, self.customer_row_values, height=20)
+        self.tree = self.grid.tree
         
         column_widths = {"ID": 60, "Tên": 150, "Email": 200, "Điện thoại": 120, 
                         "Địa chỉ": 200, "Loại KH": 150, "Ngày tạo": 150}
@@ -1009,12 +4992,11 @@ class CustomerManagementApp:
             self.tree.heading(col, text=col)
             self.tree.column(col, width=column_widths.get(col, 150), anchor=tk.CENTER)
         
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
         h_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.grid.v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
         
         # Bind double click - admin có thể edit, user chỉ xem
@@ -1023,25 +5005,26 @@ class CustomerManagementApp:
         else:
             self.tree.bind("<Double-1>", lambda event: self.view_customer())
     
+    @staticmethod
+    def customer_row_values(customer):
+        """Giá trị các cột của một dòng khách hàng"""
+        return (
+            customer["id"],
+            customer["name"],
+            customer["email"],
+            customer["phone"],
+            customer["address"],
+            customer.get("customer_type", "Khách hàng thường"),
+            customer.get("created_date", "")
+        )
+    
+    @Metrics.timed()
     def load_customer_data(self, customers=None):
-        """Tải dữ liệu khách hàng vào bảng"""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
+        """Tải dữ liệu khách hàng vào bảng (chỉ vẽ các dòng đang hiển thị)"""
         if customers is None:
             customers = self.customer_manager.customers
         
-        for customer in customers:
-            self.tree.insert("", tk.END, values=(
-                customer["id"],
-                customer["name"],
-                customer["email"],
-                customer["phone"],
-                customer["address"],
-                customer.get("customer_type", "Khách hàng thường"),
-                customer.get("created_date", "")
-            ))
-        
+        self.grid.set_rows(customers)
         self.update_statistics(len(customers))
     
     def update_statistics(self, count):
@@ -1053,15 +5036,14 @@ class CustomerManagementApp:
             self.stats_label.config(text=f"Hiển thị: {count}/{total} khách hàng")
     
     def on_search(self, event=None):
-        """Xử lý tìm kiếm"""
+        """Xử lý tìm kiếm: trì hoãn khi đang gõ và chạy trên luồng nền"""
         keyword = self.search_var.get().strip()
         
         if keyword:
-            customers = self.customer_manager.search_customers(keyword)
+            self.search_scheduler.schedule(keyword)
         else:
-            customers = self.customer_manager.customers
-        
-        self.load_customer_data(customers)
+            self.search_scheduler.cancel()
+            self.load_customer_data(self.customer_manager.customers)
     
     def on_sort(self, event=None):
         """Xử lý sắp xếp"""
@@ -1083,18 +5065,11 @@ class CustomerManagementApp:
         }
         
         if sort_option in sort_mapping:
+            # Kết quả sắp xếp đã bao gồm từ khóa hiện tại, bỏ truy vấn đang chờ
+            self.search_scheduler.cancel()
             column, reverse = sort_mapping[sort_option]
-            sorted_customers = self.customer_manager.sort_customers(column, reverse)
-            
             keyword = self.search_var.get().strip()
-            if keyword:
-                sorted_customers = [c for c in sorted_customers 
-                                  if keyword.lower() in c["name"].lower() or 
-                                     keyword.lower() in c["email"].lower() or 
-                                     keyword.lower() in c["phone"].lower() or 
-                                     keyword.lower() in c["address"].lower() or
-                                     keyword.lower() in c.get("customer_type", "").lower()]
-            
+            sorted_customers = self.customer_manager.sort_customers(column, reverse, keyword)
             self.load_customer_data(sorted_customers)
     
     def add_customer(self):
@@ -1109,7 +5084,7 @@ class CustomerManagementApp:
         if not self.user_manager.can_edit_customers():
             messagebox.showerror("Lỗi", "Bạn không có quyền sửa thông tin khách hàng!")
             return
-            
+        
         selected = self.tree.selection()
         if not selected:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn khách hàng cần sửa!")
@@ -1118,12 +5093,7 @@ class CustomerManagementApp:
         item = self.tree.item(selected[0])
         customer_id = item["values"][0]
         
-        customer = None
-        for c in self.customer_manager.customers:
-            if c["id"] == customer_id:
-                customer = c
-                break
-        
+        customer = self.customer_manager.get_customer(customer_id)
         if customer:
             self.show_customer_form(customer)
     
@@ -1137,12 +5107,7 @@ class CustomerManagementApp:
         item = self.tree.item(selected[0])
         customer_id = item["values"][0]
         
-        customer = None
-        for c in self.customer_manager.customers:
-            if c["id"] == customer_id:
-                customer = c
-                break
-        
+        customer = self.customer_manager.get_customer(customer_id)
         if customer:
             self.show_customer_form(customer, view_only=True)
     
@@ -1163,7 +5128,7 @@ class CustomerManagementApp:
             
             if self.customer_manager.delete_customer(customer_id):
                 messagebox.showinfo("Thành công", "Xóa khách hàng thành công!")
-                self.refresh_data()
+                self.show_all_customers()
             else:
                 messagebox.showerror("Lỗi", "Không thể xóa khách hàng!")
     
@@ -1177,7 +5142,7 @@ class CustomerManagementApp:
             title = "Xem thông tin khách hàng"
         else:
             title = "Thêm khách hàng" if customer is None else "Sửa khách hàng"
-            
+        
         form_window = tk.Toplevel(self.window)
         form_window.title(title)
         form_window.geometry("500x450")
@@ -1240,16 +5205,6 @@ class CustomerManagementApp:
         button_frame = tk.Frame(form_window)
         button_frame.grid(row=len(fields)+1, column=0, columnspan=2, pady=20)
         
-        def validate_email(email):
-            """Kiểm tra định dạng email"""
-            email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            return bool(re.match(email_pattern, email))
-        
-        def validate_phone(phone):
-            """Kiểm tra định dạng số điện thoại"""
-            phone_pattern = r'^(?:\+84|0)(?:\d{9}|\d{8})$|^(?:\+?\d{1,3})?\d{8,12}$'
-            return bool(re.match(phone_pattern, phone))
-        
         def save_customer():
             name = entries["name"].get().strip()
             email = entries["email"].get().strip()
@@ -1261,11 +5216,11 @@ class CustomerManagementApp:
                 messagebox.showerror("Lỗi", "Vui lòng nhập đầy đủ thông tin bắt buộc!")
                 return
             
-            if not validate_email(email):
+            if not CustomerValidator.validate_email(email):
                 messagebox.showerror("Lỗi", "Email không hợp lệ! Vui lòng nhập đúng định dạng (VD: ten@domain.com)")
                 return
             
-            if not validate_phone(phone):
+            if not CustomerValidator.validate_phone(phone):
                 messagebox.showerror("Lỗi", "Số điện thoại không hợp lệ! Vui lòng nhập số hợp lệ (VD: +84912345678 hoặc 0912345678)")
                 return
             
@@ -1274,7 +5229,7 @@ class CustomerManagementApp:
                 if success:
                     messagebox.showinfo("Thành công", message)
                     form_window.destroy()
-                    self.refresh_data()
+                    self.show_all_customers()
                 else:
                     messagebox.showerror("Lỗi", message)
             else:
@@ -1282,7 +5237,7 @@ class CustomerManagementApp:
                 if success:
                     messagebox.showinfo("Thành công", message)
                     form_window.destroy()
-                    self.refresh_data()
+                    self.show_all_customers()
                 else:
                     messagebox.showerror("Lỗi", message)
         
@@ -1302,7 +5257,9 @@ class CustomerManagementApp:
             messagebox.showerror("Lỗi", "Chỉ admin mới có quyền import dữ liệu!")
             return
         
-        if messagebox.askyesno("Xác nhận", "Import dữ liệu sẽ thay thế toàn bộ dữ liệu hiện tại. Bạn có chắc?"):
+        if messagebox.askyesno("Xác nhận", "Dữ liệu từ API sẽ được gộp vào dữ liệu hiện tại: "
+                               "thêm khách hàng mới, cập nhật khách hàng đã thay đổi "
+                               "(ghép theo email hoặc số điện thoại). Tiếp tục?"):
             loading_window = tk.Toplevel(self.window)
             loading_window.title("Đang tải...")
             loading_window.geometry("300x100")
@@ -1313,25 +5270,173 @@ class CustomerManagementApp:
             tk.Label(loading_window, text="Đang tải dữ liệu từ API...", 
                     font=("Arial", 12)).pack(pady=30)
             
-            def import_data():
-                success = self.customer_manager.import_sample_data()
+            def on_done(report):
                 loading_window.destroy()
-                
-                if success:
-                    messagebox.showinfo("Thành công", "Import dữ liệu thành công!")
-                    self.refresh_data()
-                else:
+                if not report:
                     messagebox.showerror("Lỗi", "Không thể import dữ liệu từ API!")
+                    return
+                
+                message = (f"Đã nhận: {report['total']} khách hàng\n"
+                           f"Thêm mới: {report['inserted']}\n"
+                           f"Cập nhật: {report['updated']}\n"
+                           f"Không đổi: {report['unchanged']}\n"
+                           f"Trùng tên: {report['duplicates']}\n"
+                           f"Lỗi: {len(report['errors'])}")
+                messagebox.showinfo("Kết quả import", message)
+                self.load_customer_data()
+            
+            def on_error(error):
+                loading_window.destroy()
+                messagebox.showerror("Lỗi", f"Không thể import dữ liệu từ API: {error}")
             
-            threading.Thread(target=import_data, daemon=True).start()
+            self.tasks.run_in_background(self.customer_manager.import_sample_data, on_done, on_error)
     
-    def refresh_data(self):
-        """Làm mới dữ liệu"""
-        self.customer_manager.customers = self.customer_manager.load_customers()
-        self.load_customer_data()
+    def import_file(self):
+        """Import hàng loạt khách hàng từ file CSV/NDJSON - chỉ admin"""
+        if not self.user_manager.is_admin():
+            messagebox.showerror("Lỗi", "Chỉ admin mới có quyền import dữ liệu!")
+            return
+        
+        filename = filedialog.askopenfilename(
+            parent=self.window, title="Chọn file khách hàng",
+            filetypes=[("CSV", "*.csv"), ("NDJSON", "*.ndjson *.jsonl"), ("Tất cả", "*.*")])
+        if not filename:
+            return
+        
+        loading_window = tk.Toplevel(self.window)
+        loading_window.title("Đang import...")
+        loading_window.geometry("300x100")
+        loading_window.resizable(False, False)
+        loading_window.transient(self.window)
+        loading_window.grab_set()
+        tk.Label(loading_window, text="Đang import dữ liệu từ file...", 
+                font=("Arial", 12)).pack(pady=30)
+        
+        def on_done(report):
+            loading_window.destroy()
+            message = (f"Đã đọc: {report['total']} dòng\n"
+                       f"Đã thêm: {report['imported']} khách hàng\n"
+                       f"Trùng tên: {report['duplicates']}\n"
+                       f"Lỗi: {len(report['errors'])}")
+            for row_number, error in report["errors"][:10]:
+                message += f"\n  - Dòng {row_number}: {error}"
+            messagebox.showinfo("Kết quả import", message)
+            self.load_customer_data()
+        
+        def on_error(error):
+            loading_window.destroy()
+            messagebox.showerror("Lỗi", f"Không thể import file: {error}")
+        
+        self.tasks.run_in_background(lambda: self.customer_manager.bulk_import(filename),
+                                     on_done, on_error)
+    
+    def show_search_help(self):
+        """Hướng dẫn cú pháp tìm kiếm theo trường"""
+        messagebox.showinfo("Cú pháp tìm kiếm",
+                            "Gõ từ khóa để tìm trên mọi trường (không phân biệt dấu), hoặc lọc theo trường:\n\n"
+                            "type:VIP  (loai:)  loại khách hàng\n"
+                            "name:\"trần văn\"  (ten:)  tên\n"
+                            "email:gmail.com  phone:091  (sdt:)  address:\"quận 1\"  (diachi:)\n"
+                            "created:2025  created:2025-01..2025-06  created:2025-03..  (ngay:)\n\n"
+                            "Các điều kiện được kết hợp với nhau (AND), vd:\n"
+                            "type:VIP email:gmail.com created:2025-01..2025-06")
+    
+    def show_all_customers(self):
+        """Bỏ lọc/sắp xếp và hiển thị dữ liệu trong bộ nhớ (không đọc lại file)"""
+        self.search_scheduler.cancel()
         self.search_var.set("")
         self.sort_var.set("")
-        messagebox.showinfo("Thành công", "Đã làm mới dữ liệu!")
+        self.load_customer_data()
+    
+    def show_metrics_panel(self):
+        """Bảng số liệu hiệu năng của các thao tác, tự cập nhật mỗi giây"""
+        panel = tk.Toplevel(self.window)
+        panel.title("Hiệu năng")
+        panel.geometry("900x400")
+        panel.transient(self.window)
+        
+        toolbar = tk.Frame(panel)
+        toolbar.pack(fill=tk.X, padx=10, pady=5)
+        enabled_var = tk.BooleanVar(value=Metrics.enabled)
+        
+        def toggle():
+            Metrics.enabled = enabled_var.get()
+        
+        def export():
+            filename = filedialog.asksaveasfilename(parent=panel, title="Xuất số liệu hiệu năng",
+                                                    defaultextension=".json", filetypes=[("JSON", "*.json")])
+            if filename:
+                if Metrics.dump(filename):
+                    messagebox.showinfo("Thành công", f"Đã xuất số liệu ra {filename}", parent=panel)
+                else:
+                    messagebox.showerror("Lỗi", "Không thể ghi file!", parent=panel)
+        
+        tk.Checkbutton(toolbar, text="Bật đo hiệu năng", variable=enabled_var, command=toggle).pack(side=tk.LEFT)
+        tk.Button(toolbar, text="Xóa số liệu", command=lambda: (Metrics.reset(), refresh(False))).pack(side=tk.LEFT, padx=5)
+        tk.Button(toolbar, text="Xuất JSON", command=export).pack(side=tk.LEFT, padx=5)
+        
+        columns = ("operation", "count", "errors", "mean", "p50", "p99", "max")
+        headings = ("Thao tác", "Số lần", "Lỗi", "TB (ms)", "p50 (ms)", "p99 (ms)", "Max (ms)")
+        tree = ttk.Treeview(panel, columns=columns, show="headings")
+        for column, heading in zip(columns, headings):
+            tree.heading(column, text=heading)
+            tree.column(column, width=300 if column == "operation" else 80,
+                        anchor=tk.W if column == "operation" else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
+        def refresh(repeat=True):
+            if not panel.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            # Thao tác chậm nhất (p99) lên đầu
+            rows = sorted(Metrics.snapshot().items(), key=lambda item: item[1]["p99_ms"], reverse=True)
+            for name, stats in rows:
+                tree.insert("", tk.END, values=(name, stats["count"], stats["errors"], stats["mean_ms"],
+                                                stats["p50_ms"], stats["p99_ms"], stats["max_ms"]))
+            if repeat:
+                panel.after(1000, refresh)
+        
+        refresh()
+    
+    def refresh_data(self):
+        """Làm mới dữ liệu trên luồng nền, chỉ đọc lại khi máy khác đã ghi"""
+        self.search_scheduler.cancel()
+        
+        def on_done(changed):
+            self.show_all_customers()
+            if changed:
+                messagebox.showinfo("Thành công", "Đã làm mới dữ liệu!")
+            else:
+                messagebox.showinfo("Thông báo", "Dữ liệu không thay đổi kể từ lần tải trước.")
+        
+        def on_error(error):
+            messagebox.showerror("Lỗi", f"Không thể làm mới dữ liệu: {error}")
+        
+        self.tasks.run_exclusive(self.customer_manager.refresh_if_changed, on_done, on_error)
+    
+    def poll_external_changes(self):
+        """Định kỳ kiểm tra máy khác đã ghi dữ liệu chưa; có thì áp dụng thay đổi và vẽ lại bảng"""
+        def on_done(changed):
+            self.polling = False
+            if changed:
+                self.redisplay_customers()
+        
+        def on_error(error):
+            self.polling = False
+            print(f"Lỗi làm mới dữ liệu: {error}")
+        
+        if not self.tasks.busy and not self.polling:
+            # Kiểm tra (stat file) và đọc phần thay đổi đều chạy ở luồng nền
+            self.polling = True
+            self.tasks.run_in_background(self.customer_manager.refresh_if_changed, on_done, on_error)
+        self.window.after(self.POLL_INTERVAL_MS, self.poll_external_changes)
+    
+    def redisplay_customers(self):
+        """Vẽ lại bảng theo từ khóa và cách sắp xếp đang chọn"""
+        if self.sort_var.get():
+            self.on_sort()
+        else:
+            self.on_search()
     
     def logout(self):
         """Đăng xuất"""
@@ -1343,9 +5448,17 @@ class CustomerManagementApp:
     def on_closing(self):
         """Xử lý khi đóng ứng dụng"""
         if messagebox.askyesno("Xác nhận", "Bạn có chắc muốn thoát ứng dụng?"):
+            # Chờ luồng nền ghi xong dữ liệu trước khi thoát
+            self.saver.flush()
             self.window.destroy()
 
+StartupReport.mark("module")
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Chế độ dòng lệnh, vd: python -m Nhóm_19_Bảo_Phúc customers search "Nguyễn"
+        sys.exit(CommandLine.run(sys.argv[1:]))
+    
     print("Khởi động Hệ Thống Quản Lý Khách Hàng...")
     print("Tài khoản mặc định: admin / admin123")
     print("Câu hỏi bảo mật mặc định: Tên thú cưng đầu tiên của bạn?")